@@ -1,6 +1,7 @@
 import logging
 import os
 import sys
+import tempfile
 
 import dj_database_url
 import dotenv
@@ -154,6 +155,46 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_DEFAULT_QUEUE = 'default'
+# synced into django-celery-beat periodic tasks when beat starts
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-slot-holds': {
+        'task': 'schedules.tasks.release_expired_holds',
+        'schedule': 60.0,
+    },
+    'resume-broadcast-jobs': {
+        'task': 'users.tasks.resume_broadcast_jobs',
+        'schedule': 300.0,
+    },
+}
+
+
+# -----> USER CACHE
+# users looked up on every update are cached for USER_CACHE_TTL seconds after they are read from the DB;
+# their profile (names, updated_at) is written at most once per USER_TOUCH_INTERVAL seconds
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+USER_TOUCH_INTERVAL = int(os.getenv("USER_TOUCH_INTERVAL", 300))
+# every process keeps its own copies USER_CACHE_LOCAL_TTL seconds at most: admin edits (is_admin, is_verified_user)
+# reach the other processes within that time; with USER_CACHE_USE_REDIS entries are shared through REDIS_URL
+# for USER_CACHE_TTL seconds and invalidated there at once
+USER_CACHE_USE_REDIS = os.getenv("USER_CACHE_USE_REDIS", default=False) in ['True', 'true', '1', True]
+USER_CACHE_LOCAL_TTL = int(os.getenv("USER_CACHE_LOCAL_TTL", 5))
+# profile writes of existing users are buffered and flushed in bulk every USER_ACTIVITY_FLUSH_INTERVAL seconds
+USER_ACTIVITY_FLUSH_INTERVAL = float(os.getenv("USER_ACTIVITY_FLUSH_INTERVAL", 5))
+USER_ACTIVITY_BUFFER_MAXSIZE = int(os.getenv("USER_ACTIVITY_BUFFER_MAXSIZE", 1000))
+
+
+# -----> SCHEDULES
+# step (minutes) between the start times offered to a client inside a free gap
+SCHEDULE_SLOT_GRANULARITY = int(os.getenv("SCHEDULE_SLOT_GRANULARITY", 15))
+
+# choices made so far in a booking menu are kept BOOKING_SESSION_TTL seconds after the last button press;
+# share them between workers through REDIS_URL, otherwise another worker resolves them again from the DB
+BOOKING_SESSION_MAXSIZE = int(os.getenv("BOOKING_SESSION_MAXSIZE", 10000))
+BOOKING_SESSION_TTL = int(os.getenv("BOOKING_SESSION_TTL", 900))
+BOOKING_SESSION_USE_REDIS = os.getenv("BOOKING_SESSION_USE_REDIS", default=False) in ['True', 'true', '1', True]
+# a chosen time is held (busy for others) for SCHEDULE_HOLD_TTL seconds until the client confirms it
+SCHEDULE_HOLD_TTL = int(os.getenv("SCHEDULE_HOLD_TTL", 180))
 
 
 # -----> TELEGRAM
@@ -167,6 +208,47 @@ if TELEGRAM_TOKEN is None:
 
 TELEGRAM_LOGS_CHAT_ID = os.getenv("TELEGRAM_LOGS_CHAT_ID", default=None)
 
+# HTTP connections to Telegram kept open per process (shared by handlers, celery tasks and broadcasts)
+TELEGRAM_CON_POOL_SIZE = int(os.getenv("TELEGRAM_CON_POOL_SIZE", 16))
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", 5))
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", 5))
+# seconds a pooled connection may stay idle before TCP keep-alive probes are sent (proxied connections;
+# direct ones use python-telegram-bot's 120 seconds)
+TELEGRAM_KEEPALIVE_IDLE = int(os.getenv("TELEGRAM_KEEPALIVE_IDLE", 120))
+# getMe result is shared by all processes through this file and refreshed once a day
+BOT_INFO_CACHE_FILE = os.getenv("BOT_INFO_CACHE_FILE", os.path.join(tempfile.gettempdir(), 'tgbot_info.json'))
+BOT_INFO_TTL = int(os.getenv("BOT_INFO_TTL", 24 * 60 * 60))
+
+# broadcasts: concurrent senders and the global rate (Telegram allows about 30 messages per second)
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", 8))
+BROADCAST_RATE_LIMIT = float(os.getenv("BROADCAST_RATE_LIMIT", 25))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", 3))
+# broadcast jobs are split into chunks of recipients, one celery task per chunk;
+# BROADCAST_CONCURRENT_CHUNKS is the number of celery processes expected to send at the same time
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", 1000))
+BROADCAST_CONCURRENT_CHUNKS = int(os.getenv("BROADCAST_CONCURRENT_CHUNKS", 2))
+# a running chunk without progress for this many seconds is considered dead and may be resumed
+BROADCAST_STALE_AFTER = int(os.getenv("BROADCAST_STALE_AFTER", 120))
+
+# webhook updates: "celery" (one task per update) or "inprocess" (thread pool of the web process;
+# once WEBHOOK_QUEUE_SIZE updates are waiting, a request waits WEBHOOK_SUBMIT_WAIT seconds for room in its chat's
+# queue and is refused after that, Telegram delivers it again)
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "celery")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 8))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 100))
+WEBHOOK_SUBMIT_WAIT = float(os.getenv("WEBHOOK_SUBMIT_WAIT", 5))
+# updates of one chat run one at a time across all processes (redis lock per chat, not needed for DEBUG
+# where updates are processed in the request); a lock expires after WEBHOOK_CHAT_LOCK_TIMEOUT seconds and
+# an update waits for it WEBHOOK_CHAT_LOCK_WAIT seconds at a time, then it is retried (never run without the lock)
+WEBHOOK_CHAT_LOCK = os.getenv("WEBHOOK_CHAT_LOCK", default=not DEBUG) in ['True', 'true', '1', True]
+WEBHOOK_CHAT_LOCK_TIMEOUT = int(os.getenv("WEBHOOK_CHAT_LOCK_TIMEOUT", 30))
+WEBHOOK_CHAT_LOCK_WAIT = int(os.getenv("WEBHOOK_CHAT_LOCK_WAIT", 10))
+# update_ids already received are dropped; the last WEBHOOK_DEDUP_SIZE are kept per process and,
+# with WEBHOOK_DEDUP_REDIS, for WEBHOOK_DEDUP_TTL seconds in redis for all processes
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", 10000))
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", 24 * 60 * 60))
+WEBHOOK_DEDUP_REDIS = os.getenv("WEBHOOK_DEDUP_REDIS", default=not DEBUG) in ['True', 'true', '1', True]
+
 # -----> SENTRY
 # import sentry_sdk
 # from sentry_sdk.integrations.django import DjangoIntegration
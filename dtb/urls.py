@@ -28,6 +28,7 @@ urlpatterns = [
     path('__debug__/', include(debug_toolbar.urls)),
     path('', views.index, name="index"),
     path('super_secter_webhook/', csrf_exempt(views.TelegramBotWebhookView.as_view())),
+    path('super_secter_webhook/metrics/', views.webhook_metrics),
 ]
 
 if settings.DEBUG:
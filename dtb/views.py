@@ -1,21 +1,66 @@
 import json
 import logging
+import time
+
 from django.views import View
 from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from telegram import Update
 
 from dtb.celery import app
-from dtb.settings import DEBUG
+from dtb.settings import (DEBUG, REDIS_URL, WEBHOOK_MODE, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_SUBMIT_WAIT,
+                          WEBHOOK_CHAT_LOCK, WEBHOOK_CHAT_LOCK_TIMEOUT, WEBHOOK_CHAT_LOCK_WAIT, WEBHOOK_DEDUP_SIZE,
+                          WEBHOOK_DEDUP_TTL, WEBHOOK_DEDUP_REDIS)
 from tgbot.dispatcher import dispatcher
 from tgbot.main import bot
+from tgbot.webhook import (ChatLocks, ChatLockTimeout, UpdateDeduplicator, UpdateExecutor, get_chat_id, latency,
+                           observe_latency)
 
 logger = logging.getLogger(__name__)
 
 
-@app.task(ignore_result=True)
-def process_telegram_event(update_json):
+def _get_redis_client():
+    if not (WEBHOOK_CHAT_LOCK or WEBHOOK_DEDUP_REDIS):
+        return None
+
+    import redis
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=1)
+
+
+redis_client = _get_redis_client()
+chat_locks = ChatLocks(redis_client, timeout=WEBHOOK_CHAT_LOCK_TIMEOUT, blocking_timeout=WEBHOOK_CHAT_LOCK_WAIT)
+deduplicator = UpdateDeduplicator(
+    maxsize=WEBHOOK_DEDUP_SIZE,
+    ttl=WEBHOOK_DEDUP_TTL,
+    redis_client=redis_client if WEBHOOK_DEDUP_REDIS else None,
+)
+
+
+def process_update(update_json):
     update = Update.de_json(update_json, bot)
-    dispatcher.process_update(update)
+    if not WEBHOOK_CHAT_LOCK:
+        dispatcher.process_update(update)
+        return
+
+    # e.g. a double tap on "Confirm" must not book twice in parallel
+    with chat_locks.hold(get_chat_id(update_json)):
+        dispatcher.process_update(update)
+
+
+@app.task(bind=True, ignore_result=True, max_retries=None)
+def process_telegram_event(self, update_json, received_at=None):
+    try:
+        process_update(update_json)
+    except ChatLockTimeout as e:
+        # never run it without the chat's lock: back to the queue, the lock expires in WEBHOOK_CHAT_LOCK_TIMEOUT
+        raise self.retry(exc=e, countdown=1)
+    if received_at is not None:
+        observe_latency('celery', received_at)
+
+
+executor = UpdateExecutor(
+    process_update, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE, submit_timeout=WEBHOOK_SUBMIT_WAIT
+)
 
 
 def index(request):
@@ -24,18 +69,48 @@ def index(request):
 
 class TelegramBotWebhookView(View):
     # WARNING: if fail - Telegram webhook will be delivered again.
-    # Can be fixed with async celery task execution
+    # Re-delivered updates are dropped by update_id, unless handing the update over failed
     def post(self, request, *args, **kwargs):
-        if DEBUG:
-            process_telegram_event(json.loads(request.body))
-        else:
-            # Process Telegram event in Celery worker (async)
-            # Don't forget to run it and & Redis (message broker for Celery)!
-            # Locally, You can run all of these services via docker-compose.yml
-            process_telegram_event.delay(json.loads(request.body))
+        update_json = json.loads(request.body)
+        received_at = time.time()
+
+        update_id = update_json.get('update_id')
+        if update_id is not None and deduplicator.is_duplicate(update_id):
+            return JsonResponse({"ok": "Duplicate update skipped"})
+
+        try:
+            if DEBUG:
+                process_telegram_event(update_json)
+            elif WEBHOOK_MODE == 'inprocess':
+                # Processed by a thread of this web process, no broker round trip
+                if not executor.submit(update_json, received_at):
+                    # Handing it to Celery could run it before the chat's queued updates: let Telegram retry
+                    if update_id is not None:
+                        deduplicator.forget(update_id)
+                    return JsonResponse({"error": "Too many updates, try again later"}, status=503)
+            else:
+                # Process Telegram event in Celery worker (async)
+                # Don't forget to run it and & Redis (message broker for Celery)!
+                # Locally, You can run all of these services via docker-compose.yml
+                process_telegram_event.delay(update_json, received_at)
+        except Exception:
+            if update_id is not None:
+                deduplicator.forget(update_id)
+            raise
 
         # e.g. remove buttons, typing event
         return JsonResponse({"ok": "POST request processed"})
 
     def get(self, request, *args, **kwargs):  # for debug
         return JsonResponse({"ok": "Get request received! But nothing done"})
+
+
+@staff_member_required
+def webhook_metrics(request):
+    """ Histograms of this web process only: celery workers log theirs, see tgbot.webhook.REPORT_EVERY """
+    return JsonResponse({
+        "mode": WEBHOOK_MODE,
+        "executor": executor.get_metrics(),
+        "duplicates": deduplicator.duplicates,
+        "latency": {path: histogram.snapshot() for path, histogram in latency.items()},
+    })
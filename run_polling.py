@@ -3,22 +3,21 @@ import os, django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dtb.settings')
 django.setup()
 
-from telegram import Bot
 from telegram.ext import Updater
 
 from dtb.settings import TELEGRAM_TOKEN
 from tgbot.dispatcher import setup_dispatcher
+from tgbot.client import get_bot, get_bot_username
 
 
 def run_polling(tg_token: str = TELEGRAM_TOKEN):
     """ Run bot in polling mode """
-    updater = Updater(tg_token, use_context=True)
+    updater = Updater(bot=get_bot(tg_token), use_context=True)
 
     dp = updater.dispatcher
     dp = setup_dispatcher(dp)
 
-    bot_info = Bot(tg_token).get_me()
-    bot_link = f"https://t.me/{bot_info['username']}"
+    bot_link = f"https://t.me/{get_bot_username(tg_token)}"
 
     print(f"Polling of '{bot_link}' has started")
     # it is really useful to send '👋' emoji to developer
@@ -2,6 +2,8 @@ from django.contrib import admin
 
 from django import forms
 
+from users.cache import user_cache
+
 from .models import WorkDay, Appointment, UserAuthenticationRequest
 
 
@@ -9,11 +11,35 @@ class WorkDayAdmin(admin.ModelAdmin):
     list_display = ('date', 'work_hour_start', 'work_hour_end', 'is_weekend', 'is_visible')
     list_filter = ('is_weekend', 'is_visible')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # working hours define the bitmap layout
+        obj.rebuild_occupancy()
+
 
 class AppointmentsAdmin(admin.ModelAdmin):
-    list_display = ('date', 'start_time', 'end_time', 'procedure', 'user_id', 'is_cancelled', 'available_slot')
+    list_display = ('date', 'start_time', 'end_time', 'procedure', 'user_id', 'is_cancelled', 'available_slot',
+                    'held_until')
     list_filter = ('date',)
 
+    # manual edits of slots keep the occupancy bitmaps of their days in sync
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.date.rebuild_occupancy()
+        if change and 'date' in form.changed_data and form.initial.get('date'):
+            WorkDay.objects.get(pk=form.initial['date']).rebuild_occupancy()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        obj.date.rebuild_occupancy()
+
+    def delete_queryset(self, request, queryset):
+        days = list(WorkDay.objects.filter(appointments__in=queryset).distinct())
+        super().delete_queryset(request, queryset)
+        for day in days:
+            day.rebuild_occupancy()
+
 
 class UserAuthenticationRequestForm(forms.ModelForm):
     is_verified_user = forms.BooleanField(label='Is Verified User', required=False)
@@ -27,6 +53,7 @@ class UserAuthenticationRequestForm(forms.ModelForm):
         user = instance.user
         user.is_verified_user = self.cleaned_data['is_verified_user']
         user.save()
+        user_cache.invalidate(user.user_id)
         if commit:
             instance.save()
         return instance
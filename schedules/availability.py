@@ -0,0 +1,67 @@
+"""
+    Availability of a procedure over many WorkDays, computed from the days' occupancy bitmaps.
+"""
+from collections import defaultdict
+
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from users.models import User
+
+from .catalog import StagePlan
+from .models import WorkDay, Appointment, procedure_catalog
+from .slots import time_to_minutes, minutes_to_time, intervals_to_mask, bytes_to_mask
+
+
+class DayAvailability:
+    """ Whether a procedure fits into a day and the earliest time it can start """
+    __slots__ = ('day', 'earliest_start')
+
+    def __init__(self, day: WorkDay, earliest_start: Optional[int]) -> None:
+        self.day = day
+        self.earliest_start = earliest_start
+
+    def __repr__(self) -> str:
+        return f'DayAvailability({self.day}, {self.get_earliest_start_str()})'
+
+    @property
+    def fits(self) -> bool:
+        return self.earliest_start is not None
+
+    def get_earliest_start_str(self) -> Optional[str]:
+        return minutes_to_time(self.earliest_start).strftime('%H:%M') if self.fits else None
+
+
+def get_days_availability(days: QuerySet[WorkDay], procedure_name: str, procedure_stages: StagePlan,
+                          user: User) -> List[DayAvailability]:
+    """
+    Fit / no-fit and the earliest start of the procedure for every day of the queryset.
+    Free minutes come from the occupancy bitmaps loaded with the days; Appointment rows are read
+    (in one query) only for days where the user waits inside his own procedure.
+    """
+    min_minutes: int = procedure_catalog.min_minutes(procedure_name)
+    days: List[WorkDay] = [day for day in days if day.get_work_minutes()[1] >= min_minutes]
+    for day in days:
+        day.release_expired_holds()
+
+    own_waiting_by_day: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    excluded_user_id: Optional[int] = WorkDay.get_excluded_user_id(user)
+    waiting_days: List[int] = [day.pk for day in days if bytes_to_mask(day.waiting)]
+
+    if excluded_user_id is not None and waiting_days:
+        own_waiting = Appointment.objects.filter(
+            date__in=waiting_days, available_slot=True, user_id=excluded_user_id
+        ).values_list('date_id', 'start_time', 'end_time')
+        for day_id, start_time, end_time in own_waiting:
+            own_waiting_by_day[day_id].append((time_to_minutes(start_time), time_to_minutes(end_time)))
+
+    availability: List[DayAvailability] = []
+    for day in days:
+        origin, span = day.get_work_minutes()
+        busy_mask, _ = day.get_occupancy_masks()
+        free_mask: int = ((1 << span) - 1) & ~busy_mask & ~intervals_to_mask(own_waiting_by_day[day.pk], origin, span)
+
+        availability.append(DayAvailability(day, day.get_earliest_start(procedure_stages, user, free_mask=free_mask)))
+
+    return availability
@@ -0,0 +1,95 @@
+"""
+    Compiled procedure catalog.
+    Every (procedure, density, length) combination is flattened into a frozen stage plan once, at import.
+"""
+from datetime import timedelta
+
+from types import MappingProxyType
+
+from typing import Dict, Iterable, Mapping, Tuple
+
+from .packing import WaitingWindowPolicy, default_waiting_window_policy
+
+HAIR_DENSITIES: Tuple[str, ...] = ('THIN', 'MEDIUM', 'THICK')
+HAIR_LENGTHS: Tuple[str, ...] = ('SHORT', 'MEDIUM', 'LONG')
+
+
+class StagePlan:
+    """ Immutable stage durations (minutes) of a procedure for one hair profile """
+    __slots__ = ('minutes', 'waiting', 'fills_waiting', 'total_minutes', 'end_time', 'stages')
+
+    def __init__(self, minutes: Tuple[int, ...], waiting: Tuple[bool, ...], fills_waiting: bool = False) -> None:
+        object.__setattr__(self, 'minutes', minutes)
+        object.__setattr__(self, 'waiting', waiting)
+        # may the active stages be booked into waiting windows of other clients
+        object.__setattr__(self, 'fills_waiting', fills_waiting)
+        object.__setattr__(self, 'total_minutes', sum(minutes))
+        object.__setattr__(self, 'end_time', timedelta(minutes=sum(minutes)))
+        object.__setattr__(self, 'stages', MappingProxyType({
+            f'stage_{index}': timedelta(minutes=stage) for index, stage in enumerate(minutes, 1)
+        }))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __repr__(self) -> str:
+        return f'StagePlan({self.minutes}, waiting={self.waiting}, fills_waiting={self.fills_waiting})'
+
+    def _key(self) -> Tuple[Tuple[int, ...], Tuple[bool, ...], bool]:
+        return self.minutes, self.waiting, self.fills_waiting
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, StagePlan) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+
+class ProcedureCatalog:
+    """
+    O(1) lookup of stage plans by procedure name, hair density and hair length.
+    Equal plans are shared, and min/max durations per procedure are kept to prune whole days.
+    """
+    __slots__ = ('procedures', '_plans', '_bounds')
+
+    def __init__(self, procedures: Iterable, waiting_policy: WaitingWindowPolicy = default_waiting_window_policy) -> None:
+        procedures = tuple(procedures)
+        interned: Dict[StagePlan, StagePlan] = {}
+        plans: Dict[str, Mapping[str, Mapping[str, StagePlan]]] = {}
+        bounds: Dict[str, Tuple[int, int]] = {}
+
+        for procedure in procedures:
+            by_density: Dict[str, Mapping[str, StagePlan]] = {}
+
+            for hair_density in HAIR_DENSITIES:
+                by_length: Dict[str, StagePlan] = {}
+
+                for hair_length in HAIR_LENGTHS:
+                    minutes = procedure.compile_stages(hair_length, hair_density)
+                    plan = StagePlan(minutes, procedure.stage_waiting, waiting_policy.allows(procedure, sum(minutes)))
+                    by_length[hair_length] = interned.setdefault(plan, plan)
+
+                by_density[hair_density] = MappingProxyType(by_length)
+
+            plans[procedure.name_eng] = MappingProxyType(by_density)
+            totals = [plan.total_minutes for by_length in by_density.values() for plan in by_length.values()]
+            bounds[procedure.name_eng] = (min(totals), max(totals))
+
+        self.procedures: Mapping[str, object] = MappingProxyType({
+            procedure.name_eng: procedure for procedure in procedures
+        })
+        self._plans: Mapping[str, Mapping[str, Mapping[str, StagePlan]]] = MappingProxyType(plans)
+        self._bounds: Mapping[str, Tuple[int, int]] = MappingProxyType(bounds)
+
+    def plan(self, name_eng: str, hair_length: str, hair_density: str) -> StagePlan:
+        return self._plans[name_eng][hair_density][hair_length]
+
+    def min_minutes(self, name_eng: str) -> int:
+        return self._bounds[name_eng][0]
+
+    def max_minutes(self, name_eng: str) -> int:
+        return self._bounds[name_eng][1]
+
+    def shortest_minutes(self) -> int:
+        """ Shortest plan of the whole catalog: a day with a smaller largest gap fits nothing """
+        return min(low for low, _ in self._bounds.values())
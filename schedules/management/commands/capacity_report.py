@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from schedules.models import WorkDay
+from schedules.reports import get_capacity_report
+
+
+class Command(BaseCommand):
+    help = 'Shows booked minutes per work day and how much of the waiting windows was packed with other procedures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        days = WorkDay.objects.filter(is_weekend=False).order_by('date')
+        if options['date_from']:
+            days = days.filter(date__gte=options['date_from'])
+        if options['date_to']:
+            days = days.filter(date__lte=options['date_to'])
+
+        report = get_capacity_report(days)
+
+        self.stdout.write(f'{"date":<12}{"work":>6}{"busy":>6}{"util":>7}{"wait":>6}{"packed":>8}{"w.util":>8}')
+        for day in report:
+            self.stdout.write(
+                f'{str(day.day.date):<12}{day.work_minutes:>6}{day.busy_minutes:>6}{day.utilization:>7.0%}'
+                f'{day.waiting_minutes:>6}{day.packed_minutes:>8}{day.waiting_utilization:>8.0%}'
+            )
+
+        work = sum(day.work_minutes for day in report)
+        busy = sum(day.busy_minutes for day in report)
+        waiting = sum(day.waiting_minutes for day in report)
+        packed = sum(day.packed_minutes for day in report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {busy}/{work} min booked ({busy / work if work else 0:.0%}), '
+            f'{packed}/{waiting} waiting min packed ({packed / waiting if waiting else 0:.0%})'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from schedules.models import WorkDay
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the minute occupancy bitmaps of work days from their Appointment rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dates', nargs='*', help='Dates (YYYY-MM-DD) to rebuild, all days by default')
+
+    def handle(self, *args, **options):
+        days = WorkDay.objects.all()
+        if options['dates']:
+            days = days.filter(date__in=options['dates'])
+
+        rebuilt = 0
+        for day in days.iterator():
+            day.rebuild_occupancy()
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt occupancy of {rebuilt} work days'))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0007_auto_20240506_0956'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='workday',
+            name='appointments',
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='date',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='schedules.workday'),
+        ),
+    ]
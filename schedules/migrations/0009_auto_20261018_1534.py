@@ -0,0 +1,49 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+from schedules.slots import time_to_minutes, intervals_to_mask, mask_to_bytes
+
+
+def build_occupancy(apps, schema_editor):
+    WorkDay = apps.get_model('schedules', 'WorkDay')
+    Appointment = apps.get_model('schedules', 'Appointment')
+
+    for day in WorkDay.objects.filter(appointments__isnull=False).distinct().iterator():
+        origin = time_to_minutes(day.work_hour_start)
+        span = time_to_minutes(day.work_hour_end) - origin
+        free_slots = [
+            (time_to_minutes(start), time_to_minutes(end), user_id)
+            for start, end, user_id in Appointment.objects.filter(date=day, available_slot=True).values_list(
+                'start_time', 'end_time', 'user_id'
+            )
+        ]
+        free_mask = intervals_to_mask([(start, end) for start, end, _ in free_slots], origin, span)
+        waiting_mask = intervals_to_mask(
+            [(start, end) for start, end, user_id in free_slots if user_id is not None], origin, span
+        )
+
+        day.occupancy = mask_to_bytes(((1 << span) - 1) & ~free_mask, span)
+        day.waiting = mask_to_bytes(waiting_mask, span)
+        day.save(update_fields=['occupancy', 'waiting'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0008_auto_20261018_1531'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workday',
+            name='occupancy',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Занятые минуты'),
+        ),
+        migrations.AddField(
+            model_name='workday',
+            name='waiting',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Минуты ожидания клиентов'),
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
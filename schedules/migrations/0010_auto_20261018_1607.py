@@ -0,0 +1,28 @@
+# Generated by Django 3.2.9 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0009_auto_20261018_1534'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='held_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Бронь до'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='hold_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='Бронь'),
+        ),
+        migrations.AddField(
+            model_name='workday',
+            name='holds_expire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Истечение брони'),
+        ),
+    ]
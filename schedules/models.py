@@ -1,26 +1,38 @@
 import os
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Min, Value, When
 from django.core.files import File
+from django.utils.timezone import now
 
 from enum import Enum
 
 from datetime import timedelta, datetime, time
 
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from dtb.settings import SCHEDULE_SLOT_GRANULARITY, SCHEDULE_HOLD_TTL
 from users.models import User
 
+from .catalog import ProcedureCatalog, StagePlan
+from .slots import (SlotTakenError, time_to_minutes, minutes_to_time, intervals_to_mask,
+                    candidate_starts, first_candidate_start, fits_at, mask_to_bytes, bytes_to_mask)
+
 
 class WorkDay(models.Model):
     date = models.DateField('Дата', unique=True)
-    appointments = models.ManyToManyField('Appointment', related_name='workday_appointment', blank=True)
     work_hour_start = models.TimeField('Начало рабочего дня', default="09:00:00")
     work_hour_end = models.TimeField('Конец рабочего дня', default="18:00:00")
 
     is_visible = models.BooleanField('Видимый', default=False)
     is_weekend = models.BooleanField('Выходной день', default=False)
 
+    # minute bitmaps of the working day, see schedules.slots; NULL - nothing is booked yet
+    occupancy = models.BinaryField('Занятые минуты', null=True, blank=True, editable=False)
+    waiting = models.BinaryField('Минуты ожидания клиентов', null=True, blank=True, editable=False)
+    # earliest held_until of the day's slot holds; NULL - no holds
+    holds_expire_at = models.DateTimeField('Истечение брони', null=True, blank=True, editable=False)
+
     class Meta:
         ordering = ['-date']
         verbose_name = 'Рабочий день'
@@ -33,119 +45,368 @@ class WorkDay(models.Model):
         return self.date.strftime('%A')
 
     def get_or_create_appointments_slots(self) -> List['Appointment']:
-        appointments_exist: bool = self.appointments.exists()
-
-        if not appointments_exist:
-            appointment = self.appointments.create(
-                date=self,
+        if not self.appointments.exists():
+            self.appointments.create(
                 start_time=self.work_hour_start,
                 end_time=self.work_hour_end,
                 available_slot=True
             )
-            self.appointments.add(appointment)
-            self.save()
-
-            appointments: List[Appointment] = list(self.appointments.filter(available_slot=True))
-
-            return appointments
-
-        all_appointments: List[Appointment] = list(self.appointments.filter(available_slot=True))
-
-        return all_appointments
-
-    def get_available_time_slot(self, procedure_stages: Dict[str, timedelta | dict],
-                                user: User) -> Dict[str, str | bool]:
-        total_time: timedelta = procedure_stages['end_time']
 
-        appointments_slots: List[Appointment] = self.get_or_create_appointments_slots()
-
-        appointments_slots.sort(key=lambda appointment_info: appointment_info.start_time)
-
-        current_appointment: None = None
-        delete_current_appointment: bool = False
-
-        for appointment in appointments_slots:
-            if appointment.user_id == user and not appointment.user_id.first_name == "bot_one":
-                continue
-
-            appointment_total_time: timedelta = appointment.get_total_time()
-
-            if total_time == appointment_total_time:
-                delete_current_appointment: bool = True
-                current_appointment: Appointment = appointment
-                break
-            elif total_time < appointment_total_time:
-                current_appointment: Appointment = appointment
-                break
+        return list(self.appointments.filter(available_slot=True))
+
+    @staticmethod
+    def get_excluded_user_id(user: User) -> int | None:
+        """ Waiting windows of the user's own procedures are not free for him (except the admin bot user) """
+        return None if user.first_name == "bot_one" else user.pk
+
+    def get_work_minutes(self) -> Tuple[int, int]:
+        """ Start minute and length of the working day """
+        origin: int = time_to_minutes(self.work_hour_start)
+        return origin, time_to_minutes(self.work_hour_end) - origin
+
+    def get_occupancy_masks(self) -> Tuple[int, int]:
+        """ (busy, waiting) minute masks; waiting minutes are free but belong to someone's procedure """
+        return bytes_to_mask(self.occupancy), bytes_to_mask(self.waiting)
+
+    def set_occupancy(self, free_slots: Iterable[Tuple[time, time, int | None]]) -> None:
+        """ Builds both bitmaps from (start_time, end_time, user_id) of every available slot of the day """
+        origin, span = self.get_work_minutes()
+        free_slots = [(time_to_minutes(start), time_to_minutes(end), user_id) for start, end, user_id in free_slots]
+
+        free_mask: int = intervals_to_mask([(start, end) for start, end, _ in free_slots], origin, span)
+        waiting_mask: int = intervals_to_mask(
+            [(start, end) for start, end, user_id in free_slots if user_id is not None], origin, span
+        )
+
+        self.occupancy = mask_to_bytes(((1 << span) - 1) & ~free_mask, span)
+        self.waiting = mask_to_bytes(waiting_mask, span)
+
+    def add_free_slots(self, free_slots: Iterable[Tuple[time, time, int | None]]) -> None:
+        """ Marks (start_time, end_time, user_id) slots free in both bitmaps, like set_occupancy does """
+        origin, span = self.get_work_minutes()
+        free_slots = [(time_to_minutes(start), time_to_minutes(end), user_id) for start, end, user_id in free_slots]
+        busy_mask, waiting_mask = self.get_occupancy_masks()
+
+        busy_mask &= ~intervals_to_mask([(start, end) for start, end, _ in free_slots], origin, span)
+        waiting_mask |= intervals_to_mask(
+            [(start, end) for start, end, user_id in free_slots if user_id is not None], origin, span
+        )
+
+        self.occupancy = mask_to_bytes(busy_mask, span)
+        self.waiting = mask_to_bytes(waiting_mask, span)
+
+    def rebuild_occupancy(self) -> None:
+        """ Re-reads the day's Appointment rows; used after manual edits and by `manage.py rebuild_occupancy` """
+        if self.appointments.exists():
+            self.set_occupancy(self.appointments.filter(available_slot=True).values_list(
+                'start_time', 'end_time', 'user_id'
+            ))
+        else:
+            self.occupancy, self.waiting = None, None
+
+        WorkDay.objects.filter(pk=self.pk).update(occupancy=self.occupancy, waiting=self.waiting)
+
+    def get_own_waiting_mask(self, user: User) -> int:
+        excluded_user_id: int | None = self.get_excluded_user_id(user)
+        if excluded_user_id is None or not bytes_to_mask(self.waiting):
+            return 0
+
+        origin, span = self.get_work_minutes()
+        own_waiting = self.appointments.filter(available_slot=True, user_id=excluded_user_id)
+        return intervals_to_mask(
+            [(time_to_minutes(start), time_to_minutes(end)) for start, end in own_waiting.values_list('start_time', 'end_time')],
+            origin, span
+        )
+
+    def get_free_minutes_mask(self, user: User) -> int:
+        """ Free minutes of the day as seen by the user, read from the occupancy bitmap """
+        origin, span = self.get_work_minutes()
+        busy_mask, _ = self.get_occupancy_masks()
+        return ((1 << span) - 1) & ~busy_mask & ~self.get_own_waiting_mask(user)
+
+    def get_available_time_slots(self, procedure_stages: StagePlan, user: User,
+                                 granularity: int = SCHEDULE_SLOT_GRANULARITY,
+                                 free_mask: int | None = None) -> List[Tuple[int, int]]:
+        """ Every (start, end) the procedure can take, on the granularity grid and at the start of each gap """
+        origin, span = self.get_work_minutes()
+        if free_mask is None:
+            free_mask = self.get_free_minutes_mask(user)
+        _, waiting_mask = self.get_occupancy_masks()
+
+        stage_masks: List[Tuple[int, int, int]] = self.get_stage_masks(procedure_stages, free_mask, waiting_mask)
+
+        return [
+            (start, start + procedure_stages.total_minutes)
+            for start in candidate_starts(stage_masks, origin, span, granularity, free_mask)
+        ]
+
+    def get_earliest_start(self, procedure_stages: StagePlan, user: User,
+                           granularity: int = SCHEDULE_SLOT_GRANULARITY,
+                           free_mask: int | None = None) -> Optional[int]:
+        """ First start of get_available_time_slots without listing the others """
+        origin, span = self.get_work_minutes()
+        if free_mask is None:
+            free_mask = self.get_free_minutes_mask(user)
+        _, waiting_mask = self.get_occupancy_masks()
+
+        stage_masks: List[Tuple[int, int, int]] = self.get_stage_masks(procedure_stages, free_mask, waiting_mask)
+        return first_candidate_start(stage_masks, origin, span, granularity, free_mask)
+
+    @staticmethod
+    def get_stage_masks(procedure_stages: StagePlan, free_mask: int, waiting_mask: int) -> List[Tuple[int, int, int]]:
+        """
+        (offset, length, allowed minutes) of every stage.
+        Active stages go into waiting windows of other clients only if the waiting window policy allows it.
+        """
+        active_mask: int = free_mask if procedure_stages.fills_waiting else free_mask & ~waiting_mask
+
+        stage_masks: List[Tuple[int, int, int]] = []
+        offset: int = 0
+        for stage, is_waiting in zip(procedure_stages.minutes, procedure_stages.waiting):
+            stage_masks.append((offset, stage, free_mask if is_waiting else active_mask))
+            offset += stage
+
+        return stage_masks
+
+    def get_available_time_slot(self, procedure_stages: StagePlan, user: User) -> Dict[str, str | bool | List[dict]]:
+        self.release_expired_holds()
+        time_slots: List[Tuple[int, int]] = self.get_available_time_slots(procedure_stages, user)
 
         # Для данной процедуры нету времени
-        if not current_appointment:
+        if not time_slots:
             return {'cancelled': True}
 
-        start_time: datetime = datetime.combine(self.date, current_appointment.start_time)
-        end_time: datetime = start_time + total_time
-
-        start_time: str = start_time.time().strftime('%H:%M')
-        end_time: str = end_time.time().strftime('%H:%M')
+        slots: List[Dict[str, str]] = [
+            {'start_time': minutes_to_time(start).strftime('%H:%M'), 'end_time': minutes_to_time(end).strftime('%H:%M')}
+            for start, end in time_slots
+        ]
 
         return {
-            'start_time': start_time,
-            'end_time': end_time,
-            'delete_current_appointment': delete_current_appointment,
+            'start_time': slots[0]['start_time'],
+            'end_time': slots[0]['end_time'],
+            'slots': slots,
             'cancelled': False,
         }
 
     def make_appointment(
             self,
             user: User,
-            procedure_stages: Dict[str, timedelta | Dict[str, timedelta]],
-            delete_current_appointment: bool,
+            procedure_stages: StagePlan,
             start_time: time,
             procedure_name: str
-    ) -> None:
-
-        delete_appointment = self.appointments.get(start_time=start_time)
-        print(delete_appointment)
-        delete_appointment.delete()
-        self.save()
-        start_time: datetime = datetime.combine(self.date, start_time)
-
-        for index, stage in enumerate(procedure_stages['stages'].values(), 1):
-            start_time_stage: datetime = start_time
-            end_time_stage: datetime = start_time_stage + stage
-            start_time += stage
-
-            print(start_time_stage.time(), end_time_stage.time())
-
-            appointment_stage = self.appointments.create(
-                date=self,
-                start_time=start_time_stage.time(),
-                end_time=end_time_stage.time(),
-                user_id=user,
-                procedure=None if index % 2 == 0 else procedure_name,
-                available_slot=True if index % 2 == 0 else False
+    ) -> List['Appointment']:
+        """
+        Books the procedure as one transaction under a row lock on the day.
+        Raises SlotTakenError if [start_time, start_time + duration) is not free anymore.
+        """
+        return self._book(user, procedure_stages, start_time, procedure_name)
+
+    def hold_appointment(
+            self,
+            user: User,
+            procedure_stages: StagePlan,
+            start_time: time,
+            procedure_name: str,
+            hold_token: str,
+            ttl: int = SCHEDULE_HOLD_TTL
+    ) -> List['Appointment']:
+        """
+        Books the procedure tentatively for `ttl` seconds: the interval is busy for everybody else
+        until the hold is confirmed (Appointment.confirm_hold), released or expires.
+        A previous hold with the same token is released first. Raises SlotTakenError like make_appointment.
+        """
+        held_until: datetime = now() + timedelta(seconds=ttl)
+        return self._book(user, procedure_stages, start_time, procedure_name, hold_token, held_until)
+
+    def _lock(self) -> None:
+        """ Row lock on the day (inside a transaction); work hours and holds as of the lock """
+        locked_day: WorkDay = WorkDay.objects.select_for_update().get(pk=self.pk)
+        self.work_hour_start, self.work_hour_end = locked_day.work_hour_start, locked_day.work_hour_end
+        self.holds_expire_at = locked_day.holds_expire_at
+
+    def _book(
+            self,
+            user: User,
+            procedure_stages: StagePlan,
+            start_time: time,
+            procedure_name: str,
+            hold_token: Optional[str] = None,
+            held_until: Optional[datetime] = None
+    ) -> List['Appointment']:
+        start: int = time_to_minutes(start_time)
+        end: int = start + procedure_stages.total_minutes
+        excluded_user_id: int | None = self.get_excluded_user_id(user)
+
+        with transaction.atomic():
+            self._lock()
+            if self.holds_expire_at is not None and self.holds_expire_at <= now():
+                self._release_expired_holds()
+            if hold_token is not None:
+                self._release_holds(self.appointments.filter(hold_token=hold_token, held_until__isnull=False))
+
+            all_free_slots: List[Appointment] = list(self.appointments.filter(available_slot=True))
+            if not all_free_slots and not self.appointments.exists():
+                all_free_slots = self.get_or_create_appointments_slots()
+
+            free_slots: List[Appointment] = [
+                slot for slot in all_free_slots if excluded_user_id is None or slot.user_id_id != excluded_user_id
+            ]
+
+            origin, span = self.get_work_minutes()
+            free_mask: int = intervals_to_mask(
+                [(time_to_minutes(slot.start_time), time_to_minutes(slot.end_time)) for slot in free_slots], origin, span
             )
-            self.appointments.add(appointment_stage)
-        self.save()
-
-        if not delete_current_appointment:
-            appointment_stage_available = self.appointments.create(
-                date=self,
-                start_time=start_time,
-                end_time=self.work_hour_end,
-                procedure=None,
-                user_id=None,
-                available_slot=True
+            waiting_mask: int = intervals_to_mask(
+                [(time_to_minutes(slot.start_time), time_to_minutes(slot.end_time))
+                 for slot in free_slots if slot.user_id_id is not None], origin, span
+            )
+            if not fits_at(self.get_stage_masks(procedure_stages, free_mask, waiting_mask), origin, start):
+                raise SlotTakenError(self.date, start, end)
+
+            overlapping_slots: List[Appointment] = [
+                slot for slot in free_slots
+                if time_to_minutes(slot.start_time) < end and time_to_minutes(slot.end_time) > start
+            ]
+            new_appointments: List[Appointment] = []
+
+            # what is left of the free slots around the booking keeps its owner (waiting windows)
+            for slot in overlapping_slots:
+                if time_to_minutes(slot.start_time) < start:
+                    new_appointments.append(Appointment(
+                        date=self, start_time=slot.start_time, end_time=minutes_to_time(start),
+                        procedure=slot.procedure, user_id_id=slot.user_id_id, available_slot=True
+                    ))
+                if time_to_minutes(slot.end_time) > end:
+                    new_appointments.append(Appointment(
+                        date=self, start_time=minutes_to_time(end), end_time=slot.end_time,
+                        procedure=slot.procedure, user_id_id=slot.user_id_id, available_slot=True
+                    ))
+                if hold_token is not None:
+                    # the part under the hold is set aside, releasing the hold puts it back as it was
+                    new_appointments.append(Appointment(
+                        date=self, start_time=max(slot.start_time, start_time),
+                        end_time=min(slot.end_time, minutes_to_time(end)),
+                        procedure=slot.procedure, user_id_id=slot.user_id_id, hold_token=hold_token
+                    ))
+
+            stage_start: int = start
+            for stage, is_waiting in zip(procedure_stages.minutes, procedure_stages.waiting):
+                stage_end: int = stage_start + stage
+                # waiting stages of a hold are not free for others until it is confirmed
+                available_slot: bool = is_waiting and hold_token is None
+
+                new_appointments.append(Appointment(
+                    date=self,
+                    start_time=minutes_to_time(stage_start),
+                    end_time=minutes_to_time(stage_end),
+                    user_id=user,
+                    procedure=None if is_waiting else procedure_name,
+                    available_slot=available_slot,
+                    hold_token=hold_token,
+                    held_until=held_until
+                ))
+                stage_start = stage_end
+
+            Appointment.objects.filter(pk__in=[slot.pk for slot in overlapping_slots]).delete()
+            Appointment.objects.bulk_create(new_appointments)
+
+            if held_until is not None and (self.holds_expire_at is None or held_until < self.holds_expire_at):
+                self.holds_expire_at = held_until
+            self.set_occupancy(
+                [(slot.start_time, slot.end_time, slot.user_id_id)
+                 for slot in all_free_slots if slot not in overlapping_slots] +
+                [(slot.start_time, slot.end_time, slot.user_id_id)
+                 for slot in new_appointments if slot.available_slot]
+            )
+            WorkDay.objects.filter(pk=self.pk).update(
+                occupancy=self.occupancy, waiting=self.waiting, holds_expire_at=self.holds_expire_at
             )
-            self.appointments.add(appointment_stage_available)
-
-        print(self.appointments.all())
 
-        self.save()
+        return new_appointments[-len(procedure_stages.minutes):]
+
+    def has_booking(self, user: User, start_time: time, procedure_name: str) -> bool:
+        """ Whether the user's booking (not a hold) of the procedure starts at start_time, e.g. a confirmed hold """
+        return self.appointments.filter(
+            user_id=user, start_time=start_time, procedure=procedure_name, held_until__isnull=True
+        ).exists()
+
+    def release_expired_holds(self) -> bool:
+        """ Puts expired holds back to free slots; without expired holds it costs no queries """
+        if self.holds_expire_at is None or self.holds_expire_at > now():
+            return False
+
+        with transaction.atomic():
+            self._lock()
+            self._release_expired_holds()
+        return True
+
+    def release_hold(self, hold_token: str) -> None:
+        with transaction.atomic():
+            self._lock()
+            self._release_holds(self.appointments.filter(hold_token=hold_token, held_until__isnull=False))
+
+    def _release_expired_holds(self) -> None:
+        if not self._release_holds(self.appointments.filter(held_until__lte=now())):
+            # the holds were confirmed meanwhile
+            self.holds_expire_at = self._get_holds_expire_at()
+            WorkDay.objects.filter(pk=self.pk).update(holds_expire_at=self.holds_expire_at)
+
+    def _merge_free_slots(self, slot_ids: List[int]) -> None:
+        """ Joins the given free slots with adjacent free slots of the same owner, undoing the split made by a hold """
+        free_slots: Dict[int, Appointment] = {slot.pk: slot for slot in self.appointments.filter(available_slot=True)}
+        merged_ids: List[int] = []
+        changed: List[Appointment] = []
+
+        for slot_id in slot_ids:
+            slot: Optional[Appointment] = free_slots.get(slot_id)
+            if slot is None:
+                continue
+            neighbours: List[Appointment] = [slot]
+            while neighbours:
+                neighbours = [
+                    other for other in free_slots.values()
+                    if other.pk != slot.pk and other.user_id_id == slot.user_id_id
+                    and other.procedure == slot.procedure
+                    and (other.end_time == slot.start_time or other.start_time == slot.end_time)
+                ]
+                for other in neighbours:
+                    slot.start_time = min(slot.start_time, other.start_time)
+                    slot.end_time = max(slot.end_time, other.end_time)
+                    merged_ids.append(free_slots.pop(other.pk).pk)
+                    if other in changed:
+                        changed.remove(other)
+                if neighbours and slot not in changed:
+                    changed.append(slot)
+
+        if merged_ids:
+            Appointment.objects.filter(pk__in=merged_ids).delete()
+            Appointment.objects.bulk_update(changed, ['start_time', 'end_time'])
+
+    def _get_holds_expire_at(self) -> Optional[datetime]:
+        return self.appointments.filter(held_until__isnull=False).aggregate(expire_at=Min('held_until'))['expire_at']
+
+    def _release_holds(self, held_slots: models.QuerySet) -> bool:
+        """ Under the day lock: drops the held bookings and restores the slots they had set aside """
+        hold_tokens: List[str] = list(held_slots.order_by().values_list('hold_token', flat=True).distinct())
+        if not hold_tokens:
+            return False
+
+        self.appointments.filter(hold_token__in=hold_tokens, held_until__isnull=False).delete()
+        set_aside_slots: models.QuerySet = self.appointments.filter(hold_token__in=hold_tokens, held_until__isnull=True)
+        restored_ids: List[int] = list(set_aside_slots.values_list('pk', flat=True))
+        set_aside_slots.update(available_slot=True, hold_token=None)
+        self._merge_free_slots(restored_ids)
+
+        self.holds_expire_at = self._get_holds_expire_at()
+        self.set_occupancy(self.appointments.filter(available_slot=True).values_list('start_time', 'end_time', 'user_id'))
+        WorkDay.objects.filter(pk=self.pk).update(
+            occupancy=self.occupancy, waiting=self.waiting, holds_expire_at=self.holds_expire_at
+        )
+        return True
 
 
 class Appointment(models.Model):
-    date = models.ForeignKey(WorkDay, on_delete=models.CASCADE)
+    date = models.ForeignKey(WorkDay, on_delete=models.CASCADE, related_name='appointments')
     start_time = models.TimeField('Начало процедуры')
     end_time = models.TimeField('Конец процедуры')
     procedure = models.CharField('Имя процедуры', max_length=100, blank=True, null=True)
@@ -154,6 +415,10 @@ class Appointment(models.Model):
     is_cancelled = models.BooleanField('Отменено', default=False)
     available_slot = models.BooleanField('Доступный ВС', default=False)
 
+    # rows of a tentative booking have both; free slots set aside by it have only hold_token
+    hold_token = models.CharField('Бронь', max_length=64, blank=True, null=True, db_index=True)
+    held_until = models.DateTimeField('Бронь до', blank=True, null=True)
+
     class Meta:
         ordering = ['-date']
         verbose_name = 'Запись'
@@ -163,6 +428,39 @@ class Appointment(models.Model):
         return f'date: {self.date} - username: {self.user_id.username if self.user_id else None}' \
                f' - procedure: {self.procedure}'
 
+    @staticmethod
+    def confirm_hold(hold_token: str) -> bool:
+        """
+        Turns a live hold into a booking: its rows are already in place, so this is one UPDATE by token
+        (plus dropping the slots it had set aside), and its waiting stages become free waiting minutes of the day.
+        False if the hold has expired or was released.
+        """
+        moment: datetime = now()
+        held_slots: models.QuerySet = Appointment.objects.filter(hold_token=hold_token, held_until__gt=moment)
+
+        with transaction.atomic():
+            day: Optional[WorkDay] = WorkDay.objects.select_for_update().filter(
+                pk__in=held_slots.values('date_id')
+            ).first()
+            if day is None:
+                return False
+
+            waiting_slots: List[Tuple[time, time, int | None]] = list(
+                held_slots.filter(procedure__isnull=True).values_list('start_time', 'end_time', 'user_id')
+            )
+            if not held_slots.update(
+                hold_token=None,
+                held_until=None,
+                available_slot=Case(When(procedure__isnull=True, then=Value(True)), default=Value(False)),
+            ):
+                return False
+            Appointment.objects.filter(hold_token=hold_token, held_until__isnull=True).delete()
+
+            if waiting_slots:
+                day.add_free_slots(waiting_slots)
+                WorkDay.objects.filter(pk=day.pk).update(occupancy=day.occupancy, waiting=day.waiting)
+        return True
+
     def get_total_time(self) -> timedelta:
         start_datetime: datetime = datetime.combine(datetime.now(), self.start_time)
         end_datetime: datetime = datetime.combine(datetime.now(), self.end_time)
@@ -216,6 +514,8 @@ class Procedure:
     name_eng: str
     name_rus: str
     complexity: ComplexityEnum
+    stage_waiting: Tuple[bool, ...] = (False,)
+    duration_procedures: Dict[str, Dict[str, int]]
 
     def __init__(self, name_eng: str, name_rus: str, complexity: ComplexityEnum) -> None:
         self.name_eng = name_eng
@@ -231,50 +531,30 @@ class Procedure:
     def get_underline_name(self) -> str:
         return self.name_eng.replace(' ', '_')
 
-    def calculate_duration(self, hair_length: str, hair_density: str) -> dict:
-        pass
+    def compile_stages(self, hair_length: str, hair_density: str) -> Tuple[int, ...]:
+        """ Stage durations in minutes, used once to build the procedure catalog; one active stage by default """
+        return (self.duration_procedures[hair_density][hair_length],)
 
+    def calculate_duration(self, hair_length: str, hair_density: str, *args: list, **kwargs: dict) -> StagePlan:
+        return procedure_catalog.plan(self.name_eng, hair_length, hair_density)
 
-class ProcedurePermanent(Procedure):
-    duration_procedures: Dict[str, Dict[str, int]]
-
-    def calculate_duration(self, hair_length: str, hair_density: str, *args: list,
-                           **kwargs: dict) -> Dict[str, timedelta | Dict[str, timedelta]]:
-        end_time: int = self.duration_procedures[hair_density][hair_length]
-        end_time_minutes: timedelta = timedelta(minutes=end_time)
-        stage_1_end_time: timedelta = end_time_minutes
 
-        return {
-            'end_time': end_time_minutes,
-            'stages': {'stage_1': stage_1_end_time}
-        }
+class ProcedurePermanent(Procedure):
+    """ One active stage taken from duration_procedures """
 
 
 class ProcedureNonPermanent(Procedure):
     stage_1_start: Dict[str, Dict[str, int]]
     stage_2_wait: int
     stage_3_end: Dict[str, Dict[str, int]]
+    stage_waiting: Tuple[bool, ...] = (False, True, False)
 
-    def calculate_duration(self, hair_length: str, hair_density: str) -> Dict[str, timedelta | Dict[str, timedelta]]:
-        stage_1_start_time: int = self.stage_1_start[hair_density][hair_length]
-        stage_2_wait_time: int = self.stage_2_wait
-        stage_3_end_time: int = self.stage_3_end[hair_density][hair_length]
-
-        end_time: int = stage_1_start_time + stage_2_wait_time + stage_3_end_time
-        end_time_minutes: timedelta = timedelta(minutes=end_time)
-
-        stage_1_end_time: timedelta = timedelta(minutes=stage_1_start_time)
-        stage_2_end_time: timedelta = timedelta(minutes=stage_2_wait_time)
-        stage_3_end_time: timedelta = timedelta(minutes=stage_3_end_time)
-
-        return {
-            'end_time': end_time_minutes,
-            'stages': {
-                'stage_1': stage_1_end_time,
-                'stage_2': stage_2_end_time,
-                'stage_3': stage_3_end_time,
-            }
-        }
+    def compile_stages(self, hair_length: str, hair_density: str) -> Tuple[int, ...]:
+        return (
+            self.stage_1_start[hair_density][hair_length],
+            self.stage_2_wait,
+            self.stage_3_end[hair_density][hair_length],
+        )
 
 
 class ProcedureHaircut(ProcedurePermanent):
@@ -532,17 +812,8 @@ class ProcedureHairExtensionsFull(ProcedurePermanent):
         super().__init__('Hair ext full', 'Полное наращивание волос', ComplexityEnum.AVERAGE)
         self.full_area: int = 120
 
-    def calculate_duration(self, area: str, *args, **kwargs) -> Dict[str, timedelta]:
-        duration_procedure: int = self.full_area
-        duration_procedure_minutes: timedelta = timedelta(minutes=duration_procedure)
-        stage_1_time: timedelta = duration_procedure_minutes
-
-        return {
-            'end_time': duration_procedure_minutes,
-            'stages': {
-                'stage_1': stage_1_time,
-            }
-        }
+    def compile_stages(self, *args: list, **kwargs: dict) -> Tuple[int, ...]:
+        return (self.full_area,)
 
 
 class ProcedureHairExtensionsTemple(ProcedurePermanent):
@@ -550,17 +821,8 @@ class ProcedureHairExtensionsTemple(ProcedurePermanent):
         super().__init__('Hair ext temple', 'Височное наращивание волос', ComplexityEnum.AVERAGE)
         self.temporal_area: int = 40
 
-    def calculate_duration(self, *args, **kwargs) -> Dict[str, timedelta]:
-        duration_procedure: int = self.temporal_area
-        duration_procedure_minutes: timedelta = timedelta(minutes=duration_procedure)
-        stage_1_time: timedelta = duration_procedure_minutes
-
-        return {
-            'end_time': duration_procedure_minutes,
-            'stages': {
-                'stage_1': stage_1_time,
-            }
-        }
+    def compile_stages(self, *args: list, **kwargs: dict) -> Tuple[int, ...]:
+        return (self.temporal_area,)
     
 
 class ProcedureHairCheck(ProcedurePermanent):
@@ -568,16 +830,8 @@ class ProcedureHairCheck(ProcedurePermanent):
         super().__init__('Hair check', 'Проверка волос',  ComplexityEnum.EASY)
         self.duration_procedure = 15
 
-    def calculate_duration(self, *args: list, **kwargs: dict) -> Dict[str, timedelta | Dict[str, timedelta]]:
-        duration_procedure: timedelta = timedelta(minutes=self.duration_procedure)
-        stage_1_time: timedelta = duration_procedure
-
-        return {
-            'end_time': duration_procedure,
-            'stages': {
-                'stage_1': stage_1_time,
-            }
-        }
+    def compile_stages(self, *args: list, **kwargs: dict) -> Tuple[int, ...]:
+        return (self.duration_procedure,)
 
 
 class ProcedureHighlights(ProcedureNonPermanent):
@@ -618,3 +872,19 @@ class ProcedureHighlights(ProcedureNonPermanent):
                 'LONG': 90,
             },
         }
+
+
+procedure_catalog = ProcedureCatalog([
+    ProcedureHaircut(),
+    ProcedureSimpleColor(),
+    ProcedureComplexColor(),
+    ProcedureBotox(),
+    ProcedureKeratin(),
+    ProcedureLaying(),
+    ProcedureCurls(),
+    ProcedureHairstyle(),
+    ProcedureHairExtensionsFull(),
+    ProcedureHairExtensionsTemple(),
+    ProcedureHairCheck(),
+    ProcedureHighlights(),
+])
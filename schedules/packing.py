@@ -0,0 +1,30 @@
+"""
+    Packing of shorter procedures into the waiting windows of non-permanent ones.
+    While colouring, botox, keratin or highlights are taking effect (stage 2) the master is free,
+    the policy below decides who may be booked into that time.
+"""
+from typing import Collection
+
+
+class WaitingWindowPolicy:
+    """
+    Compatibility policy for waiting windows of other clients:
+    only procedures without own waiting stage (no second chemical process at the same time),
+    of an allowed complexity and not longer than `max_minutes` may be booked into them.
+    A waiting stage of a new procedure may always overlap another waiting window.
+    """
+
+    def __init__(self, allowed_complexities: Collection[str] = ('EASY', 'AVERAGE'),
+                 max_minutes: int | None = None) -> None:
+        self.allowed_complexities = frozenset(allowed_complexities)
+        self.max_minutes = max_minutes
+
+    def allows(self, procedure, total_minutes: int) -> bool:
+        if any(procedure.stage_waiting):
+            return False
+        if procedure.get_complexity_name() not in self.allowed_complexities:
+            return False
+        return self.max_minutes is None or total_minutes <= self.max_minutes
+
+
+default_waiting_window_policy = WaitingWindowPolicy()
@@ -0,0 +1,92 @@
+"""
+    Capacity utilization of work days: how much of the day is booked and
+    how much of the clients' waiting windows was packed with other procedures.
+"""
+from collections import defaultdict
+
+from typing import Dict, List, Tuple
+
+from django.db.models import QuerySet
+
+from .models import WorkDay, Appointment, procedure_catalog
+from .slots import time_to_minutes, intervals_to_mask
+
+
+class DayCapacity:
+    __slots__ = ('day', 'work_minutes', 'busy_minutes', 'waiting_minutes', 'packed_minutes', 'idle_waiting_minutes')
+
+    def __init__(self, day: WorkDay, work_minutes: int, busy_minutes: int, waiting_minutes: int,
+                 packed_minutes: int, idle_waiting_minutes: int) -> None:
+        self.day = day
+        self.work_minutes = work_minutes
+        self.busy_minutes = busy_minutes
+        self.waiting_minutes = waiting_minutes
+        self.packed_minutes = packed_minutes
+        self.idle_waiting_minutes = idle_waiting_minutes
+
+    @property
+    def free_minutes(self) -> int:
+        return self.work_minutes - self.busy_minutes
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_minutes / self.work_minutes if self.work_minutes else 0.0
+
+    @property
+    def waiting_utilization(self) -> float:
+        return self.packed_minutes / self.waiting_minutes if self.waiting_minutes else 0.0
+
+
+def get_waiting_windows(busy_slots: List[Tuple[int, str, int, int]]) -> List[Tuple[int, int]]:
+    """
+    Original waiting windows of non-permanent procedures, restored from their active stages:
+    the window is the time between stage 1 and stage 3 of the same client and procedure.
+    `busy_slots` are (user_id, procedure, start, end) sorted by user, procedure and start.
+    """
+    stages_by_booking: Dict[Tuple[int, str], List[Tuple[int, int]]] = defaultdict(list)
+    for user_id, procedure, start, end in busy_slots:
+        procedure_class = procedure_catalog.procedures.get(procedure)
+        if procedure_class is not None and any(procedure_class.stage_waiting):
+            stages_by_booking[user_id, procedure].append((start, end))
+
+    windows: List[Tuple[int, int]] = []
+    for stages in stages_by_booking.values():
+        # every booking writes exactly two active stages around its waiting window
+        for (_, first_end), (second_start, _) in zip(stages[::2], stages[1::2]):
+            if first_end < second_start:
+                windows.append((first_end, second_start))
+
+    return windows
+
+
+def get_capacity_report(days: QuerySet[WorkDay]) -> List[DayCapacity]:
+    days: List[WorkDay] = list(days)
+
+    busy_slots_by_day: Dict[int, List[Tuple[int, str, int, int]]] = defaultdict(list)
+    busy_slots = Appointment.objects.filter(
+        date__in=[day.pk for day in days], available_slot=False, user_id__isnull=False
+    ).exclude(
+        # free slots set aside by a hold
+        hold_token__isnull=False, held_until__isnull=True
+    ).order_by('date_id', 'user_id', 'procedure', 'start_time').values_list(
+        'date_id', 'user_id', 'procedure', 'start_time', 'end_time'
+    )
+    for day_id, user_id, procedure, start_time, end_time in busy_slots:
+        busy_slots_by_day[day_id].append((user_id, procedure, time_to_minutes(start_time), time_to_minutes(end_time)))
+
+    report: List[DayCapacity] = []
+    for day in days:
+        origin, span = day.get_work_minutes()
+        busy_mask, idle_waiting_mask = day.get_occupancy_masks()
+        windows_mask: int = intervals_to_mask(get_waiting_windows(busy_slots_by_day[day.pk]), origin, span)
+
+        report.append(DayCapacity(
+            day=day,
+            work_minutes=span,
+            busy_minutes=bin(busy_mask).count('1'),
+            waiting_minutes=bin(windows_mask).count('1'),
+            packed_minutes=bin(windows_mask & busy_mask).count('1'),
+            idle_waiting_minutes=bin(idle_waiting_mask).count('1'),
+        ))
+
+    return report
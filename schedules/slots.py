@@ -0,0 +1,114 @@
+"""
+    Minute bitmaps of a WorkDay and fit checks on them.
+    Intervals are half-open [start, end) and measured in minutes since midnight.
+"""
+from datetime import date, time
+
+from typing import Iterable, List, Optional, Tuple
+
+Interval = Tuple[int, int]
+
+
+def time_to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(value: int) -> time:
+    return time(value // 60, value % 60)
+
+
+class SlotTakenError(Exception):
+    """ Requested interval is no longer free: someone booked it first """
+
+    def __init__(self, day: date, start: int, end: int) -> None:
+        self.day = day
+        self.start = start
+        self.end = end
+        super().__init__(f'{day} {minutes_to_time(start):%H:%M}-{minutes_to_time(end):%H:%M} is already taken')
+
+
+def intervals_to_mask(intervals: Iterable[Interval], origin: int, span: int) -> int:
+    """ Minute bitmap of [origin, origin + span): bit i is set when minute origin + i lies inside an interval """
+    mask = 0
+    for start, end in intervals:
+        start, end = max(start, origin), min(end, origin + span)
+        if end > start:
+            mask |= ((1 << (end - start)) - 1) << (start - origin)
+    return mask
+
+
+def mask_to_bytes(mask: int, span: int) -> bytes:
+    """ Little-endian storage form of a minute bitmap: minute i is bit i % 8 of byte i // 8 """
+    return mask.to_bytes((span + 7) // 8, 'little')
+
+
+def bytes_to_mask(value: Optional[bytes]) -> int:
+    return int.from_bytes(value, 'little') if value else 0
+
+
+def run_mask(mask: int, length: int) -> int:
+    """ Bit i is set when bits i .. i + length - 1 of the mask are all set (log(length) shifts) """
+    if length <= 0:
+        return -1
+
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        mask &= mask >> step
+        covered += step
+    return mask
+
+
+def grid_mask(origin: int, span: int, granularity: int) -> int:
+    """ Bits of the minutes in [origin, origin + span) that are multiples of granularity """
+    mask = 0
+    for minute in range(-origin % granularity, span, granularity):
+        mask |= 1 << minute
+    return mask
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def fits_at(stage_masks: Iterable[Tuple[int, int, int]], origin: int, start: int) -> bool:
+    """ Whether every stage (offset, length, allowed mask) lies inside its allowed minutes when starting at `start` """
+    for offset, length, allowed_mask in stage_masks:
+        shift = start - origin + offset
+        stage_bits = (1 << length) - 1
+        if shift < 0 or (allowed_mask >> shift) & stage_bits != stage_bits:
+            return False
+    return True
+
+
+def candidate_mask(stage_masks: Iterable[Tuple[int, int, int]], origin: int, span: int,
+                   granularity: int, free_mask: int) -> int:
+    """
+    Bit i is set when every stage (offset, length, allowed mask) lies inside its allowed minutes starting at origin + i.
+    Starts are on the granularity grid or at the start of a free gap, so tight gaps are never lost.
+    """
+    valid = (1 << span) - 1
+    for offset, length, allowed_mask in stage_masks:
+        valid &= run_mask(allowed_mask, length) >> offset
+
+    gap_starts = free_mask & ~(free_mask << 1)
+    return valid & (grid_mask(origin, span, granularity) | gap_starts)
+
+
+def candidate_starts(stage_masks: Iterable[Tuple[int, int, int]], origin: int, span: int,
+                     granularity: int, free_mask: int) -> List[int]:
+    """ Every start minute of candidate_mask """
+    return [origin + minute for minute in iter_bits(candidate_mask(stage_masks, origin, span, granularity, free_mask))]
+
+
+def first_candidate_start(stage_masks: Iterable[Tuple[int, int, int]], origin: int, span: int,
+                          granularity: int, free_mask: int) -> Optional[int]:
+    """
+    Earliest start minute of candidate_mask, None if the procedure doesn't fit.
+    For one stage of N minutes this is the first gap of at least N minutes: log(N) shifts, no scan over the rows.
+    """
+    valid = candidate_mask(stage_masks, origin, span, granularity, free_mask)
+    return origin + (valid & -valid).bit_length() - 1 if valid else None
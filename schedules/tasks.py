@@ -0,0 +1,22 @@
+"""
+    Celery tasks of schedules. Scheduled by CELERY_BEAT_SCHEDULE (django-celery-beat)
+"""
+
+from django.utils.timezone import now
+
+from dtb.celery import app
+from celery.utils.log import get_task_logger
+from schedules.models import WorkDay
+
+logger = get_task_logger(__name__)
+
+
+@app.task(ignore_result=True)
+def release_expired_holds() -> None:
+    """ Frees slots of holds that were neither confirmed nor released; readers of a day also do it on the way """
+    released = 0
+    for day in WorkDay.objects.filter(holds_expire_at__lte=now()).iterator():
+        released += day.release_expired_holds()
+
+    if released:
+        logger.info(f"Released expired slot holds of {released} work days")
@@ -0,0 +1,80 @@
+from datetime import date, time
+
+from django.test import TestCase
+
+from users.models import User
+
+from .catalog import StagePlan
+from .models import WorkDay, Appointment
+from .slots import SlotTakenError, time_to_minutes
+
+
+class MakeAppointmentTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user: User = User.objects.create(user_id=1, first_name='client')
+        self.other_user: User = User.objects.create(user_id=2, first_name='other')
+        self.day: WorkDay = WorkDay.objects.create(date=date(2030, 1, 7), is_visible=True)
+        # three stages, the middle one is a waiting window
+        self.stages = StagePlan((30, 60, 30), (False, True, False))
+
+        self.day.make_appointment(self.other_user, self.stages, time(9), 'Complex Color')
+
+    def test_booking_query_count(self) -> None:
+        day: WorkDay = WorkDay.objects.get(pk=self.day.pk)
+
+        # savepoint, day lock, free slots, delete of the split slot, bulk insert, bitmaps update, release savepoint
+        with self.assertNumQueries(7):
+            booked = day.make_appointment(self.user, self.stages, time(13), 'Complex Color')
+
+        self.assertEqual([(slot.start_time, slot.end_time) for slot in booked],
+                         [(time(13), time(13, 30)), (time(13, 30), time(14, 30)), (time(14, 30), time(15))])
+        self.assertEqual(Appointment.objects.filter(date=self.day, available_slot=False).count(), 4)
+
+    def test_overlapping_booking_is_refused(self) -> None:
+        day: WorkDay = WorkDay.objects.get(pk=self.day.pk)
+        occupancy = (day.occupancy, day.waiting)
+        rows = list(Appointment.objects.filter(date=self.day).values_list('start_time', 'end_time', 'available_slot'))
+
+        # the other user's first stage is 9:00-9:30
+        with self.assertRaises(SlotTakenError):
+            day.make_appointment(self.user, StagePlan((60,), (False,)), time(8, 45), 'Haircut')
+        with self.assertRaises(SlotTakenError):
+            day.make_appointment(self.user, self.stages, time(9, 15), 'Complex Color')
+
+        day = WorkDay.objects.get(pk=self.day.pk)
+        self.assertEqual((day.occupancy, day.waiting), occupancy)
+        self.assertEqual(
+            list(Appointment.objects.filter(date=self.day).values_list('start_time', 'end_time', 'available_slot')), rows
+        )
+
+    def test_hold_blocks_candidate_starts_until_released(self) -> None:
+        stages = StagePlan((60,), (False,))
+        WorkDay.objects.get(pk=self.day.pk).hold_appointment(self.user, stages, time(13), 'Haircut', 'hold')
+
+        day: WorkDay = WorkDay.objects.get(pk=self.day.pk)
+        starts = [start for start, _ in day.get_available_time_slots(stages, self.other_user)]
+        self.assertNotIn(time_to_minutes(time(13)), starts)
+        with self.assertRaises(SlotTakenError):
+            day.make_appointment(self.other_user, stages, time(13), 'Haircut')
+
+        day.release_hold('hold')
+        day = WorkDay.objects.get(pk=self.day.pk)
+        starts = [start for start, _ in day.get_available_time_slots(stages, self.other_user)]
+        self.assertIn(time_to_minutes(time(13)), starts)
+
+    def test_confirmed_hold_stays_booked(self) -> None:
+        WorkDay.objects.get(pk=self.day.pk).hold_appointment(self.user, self.stages, time(13), 'Complex Color', 'hold')
+
+        self.assertTrue(Appointment.confirm_hold('hold'))
+        # a second tap on "confirm" finds no hold, but the booking
+        self.assertFalse(Appointment.confirm_hold('hold'))
+        self.assertTrue(WorkDay.objects.get(pk=self.day.pk).has_booking(self.user, time(13), 'Complex Color'))
+        self.assertFalse(Appointment.objects.filter(hold_token='hold', held_until__isnull=False).exists())
+        with self.assertRaises(SlotTakenError):
+            WorkDay.objects.get(pk=self.day.pk).make_appointment(self.other_user, self.stages, time(13), 'Complex Color')
+
+        # the bitmaps kept in place agree with the rows
+        day: WorkDay = WorkDay.objects.get(pk=self.day.pk)
+        occupancy = (day.occupancy, day.waiting)
+        day.rebuild_occupancy()
+        self.assertEqual((day.occupancy, day.waiting), occupancy)
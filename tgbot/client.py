@@ -0,0 +1,149 @@
+"""
+    Telegram Bot clients with pooled HTTP connections, one per process and token,
+    and the bot's own info (getMe) cached between processes.
+"""
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+from typing import Dict, Optional, Tuple
+
+import telegram
+from telegram import User
+from telegram.utils.request import Request
+from telegram.vendor.ptb_urllib3.urllib3.connection import HTTPConnection
+
+from dtb.settings import (TELEGRAM_TOKEN, TELEGRAM_CON_POOL_SIZE, TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT,
+                          TELEGRAM_KEEPALIVE_IDLE, BOT_INFO_CACHE_FILE, BOT_INFO_TTL)
+
+
+class Bot(telegram.Bot):
+    """ Takes its own info (username, id, ...) from get_bot_info instead of a getMe request per process """
+
+    @property
+    def bot(self) -> User:
+        info = get_bot_info(self.token)
+        cached = _bot_users.get(self.token)
+        if cached is None or cached[0] is not info:
+            cached = _bot_users[self.token] = (info, User.de_json(info, self))
+        return cached[1]
+
+
+_bots: Dict[Tuple[int, str, Optional[str]], Bot] = {}
+_bots_lock = threading.Lock()
+# token -> (fetched_at, getMe result)
+_bot_infos: Dict[str, Tuple[float, Dict]] = {}
+_bot_users: Dict[str, Tuple[Dict, User]] = {}
+
+
+def _make_request() -> Request:
+    socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if 'linux' in sys.platform:
+        socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, TELEGRAM_KEEPALIVE_IDLE))
+    return Request(
+        con_pool_size=TELEGRAM_CON_POOL_SIZE,
+        connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=TELEGRAM_READ_TIMEOUT,
+        # PTB passes these only to proxied pools, direct connections get its own keep-alive options
+        urllib3_proxy_kwargs={'socket_options': socket_options},
+    )
+
+
+def get_bot(tg_token: str = TELEGRAM_TOKEN, base_url: Optional[str] = None) -> Bot:
+    """
+    Bot with a pooled HTTP connection manager, one per process and token:
+    handlers, celery tasks and admin actions reuse the same keep-alive connections to Telegram
+    """
+    key = (os.getpid(), tg_token, base_url)
+    bot = _bots.get(key)
+    if bot is None:
+        with _bots_lock:
+            bot = _bots.get(key)
+            if bot is None:
+                bot = _bots[key] = Bot(tg_token, base_url=base_url, request=_make_request())
+    return bot
+
+
+def get_bot_metrics() -> Dict[str, float]:
+    """
+    HTTP requests and connections opened by the pools of this process's bots (each one a TCP + TLS handshake).
+    PTB doesn't expose its pool manager: without it the metrics stay at zero, sending is not affected.
+    """
+    requests = connections = 0
+    pid = os.getpid()
+    for (bot_pid, _, _), bot in list(_bots.items()):
+        pool_manager = getattr(bot.request, '_con_pool', None)
+        if bot_pid != pid or pool_manager is None:
+            continue
+        pools = pool_manager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                requests += pool.num_requests
+                connections += pool.num_connections
+
+    return {
+        'requests': requests,
+        'connections': connections,
+        'reuse_ratio': 1 - connections / requests if requests else 0.0,
+    }
+
+
+def _read_bot_info_cache() -> Dict[str, Dict]:
+    try:
+        with open(BOT_INFO_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_cached_bot_info(tg_token: str = TELEGRAM_TOKEN) -> Optional[Dict]:
+    """ getMe of the bot from this process or BOT_INFO_CACHE_FILE, never from the network; None if missing or stale """
+    fetched_at, info = _bot_infos.get(tg_token, (0.0, None))
+    if info is not None and time.time() - fetched_at < BOT_INFO_TTL:
+        return info
+
+    bot_id = tg_token.split(':')[0]  # the file must not contain the token itself
+    cached = _read_bot_info_cache().get(bot_id)
+    if cached is not None and time.time() - cached['fetched_at'] < BOT_INFO_TTL:
+        _bot_infos[tg_token] = (cached['fetched_at'], cached['info'])
+        return cached['info']
+    return None
+
+
+def get_bot_info(tg_token: str = TELEGRAM_TOKEN) -> Dict:
+    """
+    getMe of the bot, fetched on first use instead of at import.
+    Kept in BOT_INFO_CACHE_FILE for BOT_INFO_TTL seconds, so new processes start without network calls
+    """
+    info = load_cached_bot_info(tg_token)
+    if info is not None:
+        return info
+
+    try:
+        info = get_bot(tg_token).get_me().to_dict()
+    except telegram.error.Unauthorized:
+        logging.error("Invalid TELEGRAM_TOKEN.")
+        raise
+
+    fetched_at = time.time()
+    _bot_infos[tg_token] = (fetched_at, info)
+    with _bots_lock:
+        cache = _read_bot_info_cache()
+        cache[tg_token.split(':')[0]] = {'fetched_at': fetched_at, 'info': info}
+        try:
+            tmp_file = f'{BOT_INFO_CACHE_FILE}.{os.getpid()}'
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_file, BOT_INFO_CACHE_FILE)
+        except OSError as e:
+            logging.warning(f"Can't save bot info to {BOT_INFO_CACHE_FILE}: {e}")
+    return info
+
+
+def get_bot_username(tg_token: str = TELEGRAM_TOKEN) -> str:
+    return get_bot_info(tg_token)['username']
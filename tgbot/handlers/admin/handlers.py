@@ -1,5 +1,3 @@
-from typing import Dict
-
 from datetime import timedelta
 
 from django.utils.timezone import now
@@ -7,31 +5,21 @@ from telegram import ParseMode, Update
 from telegram.ext import CallbackContext
 
 from tgbot.handlers.admin import static_text
+from tgbot.handlers.admin.manage_data import HAIR_LENGTH_BUTTON, HAIR_DENSITY_BUTTON, CONFIRM_SELECT_HAIR_BUTTON
 from tgbot.handlers.admin.utils import _get_csv_from_qs_values
 from tgbot.handlers.utils.decorators import admin_only, send_typing_action
 from tgbot.handlers.utils.info import extract_user_data_from_update
+from tgbot.handlers.day.manage_data import SelectWay
 
 from .keyboards import (keyboard_select_way_appointment, keyboard_select_density_hair, keyboard_select_length_hair,
                         keyboard_confirm_select_hair)
 
-from users.models import User, HairLengthEnum, HairDensityEnum
+from users.models import User
+from users.cache import user_cache
 
 from django_enumfield import enum
 
 
-hair_length_enum: Dict[str, HairLengthEnum] = {
-    'SHORT': HairLengthEnum.SHORT,
-    'MEDIUM': HairLengthEnum.MEDIUM,
-    'LONG': HairLengthEnum.LONG,
-}
-
-hair_density_enum: Dict[str, HairDensityEnum] = {
-    'THIN': HairDensityEnum.THIN,
-    'MEDIUM': HairDensityEnum.MEDIUM,
-    'THICK': HairDensityEnum.THICK,
-}
-
-
 @admin_only
 def admin(update: Update, context: CallbackContext) -> None:
     """ Show help info about all secret admins commands """
@@ -64,67 +52,57 @@ def export_users(update: Update, context: CallbackContext) -> None:
 
 def confirm_select_hair(update: Update, context: CallbackContext) -> None:
     user_id: str = extract_user_data_from_update(update)['user_id']
-
-    select_way: str = update.callback_query.data.split('#')[1]
-    hair_length: str = update.callback_query.data.split('#')[2]
-    hair_density: str = update.callback_query.data.split('#')[3]
+    data = CONFIRM_SELECT_HAIR_BUTTON.decode(update.callback_query.data)
 
     text: str = static_text.confirm_select_hair.format(
-        density_hair=hair_density,
-        length_hair=hair_length
+        density_hair=data.hair_density.name,
+        length_hair=data.hair_length.name
     )
 
-    print(select_way, hair_length, hair_density)
+    print(data)
 
-    if select_way == 'ONEWAY':
-        user: User = User.objects.get(user_id=111)
-    else:
-        user: User = User.objects.get(user_id=222)
+    user_id_to_update: int = 111 if data.select_way == SelectWay.ONE_WAY else 222
 
-    user.hair_length = hair_length_enum[hair_length]
-    user.hair_density = hair_density_enum[hair_density]
-
-    user.save()
-
-    print(user.hair_density, user.hair_length)
+    # nothing of the user is needed here: write the profile without reading it
+    User.objects.filter(user_id=user_id_to_update).update(
+        hair_length=data.hair_length, hair_density=data.hair_density, updated_at=now()
+    )
+    user_cache.invalidate(user_id_to_update)
 
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
         message_id=update.callback_query.message.message_id,
         parse_mode=ParseMode.HTML,
-        reply_markup=keyboard_confirm_select_hair(select_way)
+        reply_markup=keyboard_confirm_select_hair(data.select_way)
     )
 
 
 def select_density_hair(update: Update, context: CallbackContext) -> None:
     user_id: str = extract_user_data_from_update(update)['user_id']
     text: str = static_text.select_density_hair
-
-    select_way: str = update.callback_query.data.split('#')[1]
-    hair_length: str = update.callback_query.data.split('#')[2]
+    data = HAIR_DENSITY_BUTTON.decode(update.callback_query.data)
 
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
         message_id=update.callback_query.message.message_id,
         parse_mode=ParseMode.HTML,
-        reply_markup=keyboard_select_density_hair(select_way, hair_length)
+        reply_markup=keyboard_select_density_hair(data.select_way, data.hair_length)
     )
 
 
 def select_length_hair(update: Update, context: CallbackContext) -> None:
     user_id: str = extract_user_data_from_update(update)['user_id']
     text: str = static_text.select_length_hair
-
-    select_way: str = update.callback_query.data.split('#')[1]
+    data = HAIR_LENGTH_BUTTON.decode(update.callback_query.data)
 
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
         message_id=update.callback_query.message.message_id,
         parse_mode=ParseMode.HTML,
-        reply_markup=keyboard_select_length_hair(select_way)
+        reply_markup=keyboard_select_length_hair(data.select_way)
     )
 
 
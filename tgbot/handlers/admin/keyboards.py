@@ -1,46 +1,57 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from tgbot.handlers.day.manage_data import START_PROCEDURE_BUTTON, CONFIRM_DECLINE_SCHEDULE, DECLINE_SCHEDULE
-from tgbot.handlers.admin.manage_data import (ONE_WAY_BUTTON, MULTIPLE_WAY_BUTTON, SHORT, MEDIUM,
-                                              LONG, HAIR_LENGTH_BUTTON, HAIR_DENSITY_BUTTON, THIN, THICK,
-                                              CONFIRM_SELECT_HAIR_BUTTON, HAIR_LENGTH)
+from users.models import HairLengthEnum, HairDensityEnum
+
+from tgbot.handlers.day.manage_data import START_PROCEDURE_BUTTON, DECLINE_SCHEDULE, SelectWay
+from tgbot.handlers.admin.manage_data import HAIR_LENGTH_BUTTON, HAIR_DENSITY_BUTTON, CONFIRM_SELECT_HAIR_BUTTON
+from tgbot.handlers.utils.keyboard_cache import cached_keyboard
 from tgbot.handlers.admin.static_text import (one_way, multiple_way, short, medium, long, low, high, confirm_select_yes,
                                               confirm_select_no)
 
 
-def keyboard_confirm_select_hair(select_way: str) -> InlineKeyboardMarkup:
+@cached_keyboard('confirm_select_hair')
+def keyboard_confirm_select_hair(select_way: SelectWay) -> InlineKeyboardMarkup:
     buttons = [
-        [InlineKeyboardButton(confirm_select_yes, callback_data=f'{START_PROCEDURE_BUTTON}{select_way}')],
-        [InlineKeyboardButton(confirm_select_no, callback_data=f'{CONFIRM_DECLINE_SCHEDULE}{DECLINE_SCHEDULE}')]
+        [InlineKeyboardButton(confirm_select_yes, callback_data=START_PROCEDURE_BUTTON.encode(select_way=select_way))],
+        [InlineKeyboardButton(confirm_select_no, callback_data=DECLINE_SCHEDULE.encode(select_way=select_way))]
     ]
 
     return InlineKeyboardMarkup(buttons)
 
 
-def keyboard_select_density_hair(select_way: str, hair_length: str) -> InlineKeyboardMarkup:
+@cached_keyboard('select_density_hair')
+def keyboard_select_density_hair(select_way: SelectWay, hair_length: HairLengthEnum) -> InlineKeyboardMarkup:
+    def callback_data(hair_density: HairDensityEnum) -> str:
+        return CONFIRM_SELECT_HAIR_BUTTON.encode(select_way=select_way, hair_length=hair_length, hair_density=hair_density)
+
     buttons = [
-        [InlineKeyboardButton(low, callback_data=f'{CONFIRM_SELECT_HAIR_BUTTON}{select_way}#{hair_length}#{THIN}')],
-        [InlineKeyboardButton(medium, callback_data=f'{CONFIRM_SELECT_HAIR_BUTTON}{select_way}#{hair_length}#{MEDIUM}')],
-        [InlineKeyboardButton(high, callback_data=f'{CONFIRM_SELECT_HAIR_BUTTON}{select_way}#{hair_length}#{THICK}')]
+        [InlineKeyboardButton(low, callback_data=callback_data(HairDensityEnum.THIN))],
+        [InlineKeyboardButton(medium, callback_data=callback_data(HairDensityEnum.MEDIUM))],
+        [InlineKeyboardButton(high, callback_data=callback_data(HairDensityEnum.THICK))]
     ]
 
     return InlineKeyboardMarkup(buttons)
 
 
-def keyboard_select_length_hair(select_way: str) -> InlineKeyboardMarkup:
+@cached_keyboard('select_length_hair')
+def keyboard_select_length_hair(select_way: SelectWay) -> InlineKeyboardMarkup:
+    def callback_data(hair_length: HairLengthEnum) -> str:
+        return HAIR_DENSITY_BUTTON.encode(select_way=select_way, hair_length=hair_length)
+
     buttons = [
-        [InlineKeyboardButton(short, callback_data=f'{HAIR_DENSITY_BUTTON}{select_way}#{SHORT}')],
-        [InlineKeyboardButton(medium, callback_data=f'{HAIR_DENSITY_BUTTON}{select_way}#{MEDIUM}')],
-        [InlineKeyboardButton(long, callback_data=f'{HAIR_DENSITY_BUTTON}{select_way}#{LONG}')]
+        [InlineKeyboardButton(short, callback_data=callback_data(HairLengthEnum.SHORT))],
+        [InlineKeyboardButton(medium, callback_data=callback_data(HairLengthEnum.MEDIUM))],
+        [InlineKeyboardButton(long, callback_data=callback_data(HairLengthEnum.LONG))]
     ]
 
     return InlineKeyboardMarkup(buttons)
 
 
+@cached_keyboard('select_way_appointment')
 def keyboard_select_way_appointment() -> InlineKeyboardMarkup:
     buttons = [
-        [InlineKeyboardButton(one_way, callback_data=f'{HAIR_LENGTH_BUTTON}{ONE_WAY_BUTTON}')],
-        [InlineKeyboardButton(multiple_way, callback_data=f'{HAIR_LENGTH_BUTTON}{MULTIPLE_WAY_BUTTON}')]
+        [InlineKeyboardButton(one_way, callback_data=HAIR_LENGTH_BUTTON.encode(select_way=SelectWay.ONE_WAY))],
+        [InlineKeyboardButton(multiple_way, callback_data=HAIR_LENGTH_BUTTON.encode(select_way=SelectWay.MULTIPLE_WAY))]
     ]
 
     return InlineKeyboardMarkup(buttons)
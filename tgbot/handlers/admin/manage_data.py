@@ -1,13 +1,11 @@
-ONE_WAY_BUTTON = 'ONEWAY#'
-MULTIPLE_WAY_BUTTON = 'MULTIPLEWAY#'
-HAIR_LENGTH_BUTTON = 'STARTHAIRLENGTH#'
-SHORT = 'SHORT#'
-MEDIUM = 'MEDIUM#'
-LONG = 'LONG#'
-HAIR_DENSITY_BUTTON = 'STARTHAIRDENSITY#'
-THIN = 'THIN#'
-THICK = 'THICK#'
-CONFIRM_SELECT_HAIR_BUTTON = 'CONFIRMSELECTHAIR#'
-HAIR_LENGTH = 'HAIRLENGTH#'
+from users.models import HairLengthEnum, HairDensityEnum
 
+from tgbot.handlers.day.manage_data import SELECT_WAY
+from tgbot.handlers.utils.callback_data import callback_codec, EnumField
 
+HAIR_LENGTH = EnumField('hair_length', HairLengthEnum)
+HAIR_DENSITY = EnumField('hair_density', HairDensityEnum)
+
+HAIR_LENGTH_BUTTON = callback_codec.register('hl', SELECT_WAY)
+HAIR_DENSITY_BUTTON = callback_codec.register('hd', SELECT_WAY, HAIR_LENGTH)
+CONFIRM_SELECT_HAIR_BUTTON = callback_codec.register('hc', SELECT_WAY, HAIR_LENGTH, HAIR_DENSITY)
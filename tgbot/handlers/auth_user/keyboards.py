@@ -4,11 +4,13 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from tgbot.handlers.auth_user.manage_data import SEND_PHOTO_BUTTON
 from tgbot.handlers.auth_user.static_text import start_send_photo
+from tgbot.handlers.utils.keyboard_cache import cached_keyboard
 
 from schedules.models import WorkDay
 
 
+@cached_keyboard('send_photo_auth')
 def keyboard_send_photo_auth() -> InlineKeyboardMarkup:
-    keyboard = [[InlineKeyboardButton(start_send_photo, callback_data=SEND_PHOTO_BUTTON)]]
+    keyboard = [[InlineKeyboardButton(start_send_photo, callback_data=SEND_PHOTO_BUTTON.encode())]]
 
     return InlineKeyboardMarkup(keyboard)
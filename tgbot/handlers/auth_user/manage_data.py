@@ -1 +1,3 @@
-SEND_PHOTO_BUTTON = 'SEND_PHOTO'
+from tgbot.handlers.utils.callback_data import callback_codec
+
+SEND_PHOTO_BUTTON = callback_codec.register('ph')
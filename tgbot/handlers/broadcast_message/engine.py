@@ -0,0 +1,173 @@
+"""
+    Concurrent broadcast engine.
+    Messages are sent by a pool of threads sharing one Bot with a pooled HTTP connection,
+    the global rate is held below Telegram's ~30 msg/sec by a token bucket and
+    a RetryAfter from Telegram pauses every sender, not only the one that got it.
+"""
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Iterable, List, Optional, Union
+
+import telegram
+from telegram import InlineKeyboardMarkup, MessageEntity
+
+from dtb.settings import TELEGRAM_TOKEN, BROADCAST_WORKERS, BROADCAST_RATE_LIMIT, BROADCAST_MAX_RETRIES
+from tgbot.client import get_bot, get_bot_metrics
+from users.models import User
+from users.cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# one UPDATE ... WHERE user_id IN (...) per this many recipients (keeps below the SQLite parameter limit)
+STATUS_UPDATE_BATCH_SIZE = 5000
+
+
+class TokenBucket:
+    """ `rate` tokens per second, at most `capacity` at once; acquire() blocks until a token is free """
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """ Hand out no tokens for `seconds` (Telegram answered with RetryAfter) """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._updated_at = self._paused_until
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+
+class BroadcastResult:
+    """ Outcome of one broadcast """
+
+    def __init__(self) -> None:
+        self.delivered: List[int] = []
+        self.blocked: List[int] = []
+        self.failed: List[int] = []
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def __repr__(self) -> str:
+        return (f'BroadcastResult(delivered={len(self.delivered)}, blocked={len(self.blocked)}, '
+                f'failed={len(self.failed)}, retries={self.retries}, {self.messages_per_second:.1f} msg/sec)')
+
+    def merge(self, other: 'BroadcastResult') -> None:
+        self.delivered.extend(other.delivered)
+        self.blocked.extend(other.blocked)
+        self.failed.extend(other.failed)
+        self.retries += other.retries
+        self.elapsed += other.elapsed
+
+    @property
+    def total(self) -> int:
+        return len(self.delivered) + len(self.blocked) + len(self.failed)
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+class BroadcastEngine:
+    """
+    Sends one message to many chats.
+    Every chat gets a single message per broadcast, so Telegram's per-chat limit (1 msg/sec)
+    is only reached by retries, which wait for the RetryAfter given by Telegram.
+    """
+
+    def __init__(self, tg_token: str = TELEGRAM_TOKEN, workers: int = BROADCAST_WORKERS,
+                 rate_limit: float = BROADCAST_RATE_LIMIT, max_retries: int = BROADCAST_MAX_RETRIES,
+                 base_url: Optional[str] = None) -> None:
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate_limit)
+        # workers share the process-wide pooled bot, keep BROADCAST_WORKERS <= TELEGRAM_CON_POOL_SIZE
+        self.bot = get_bot(tg_token, base_url=base_url)
+        self._lock = threading.Lock()
+
+    def _send(self, result: BroadcastResult, user_id: int, text: str, **kwargs) -> None:
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                self.bot.send_message(chat_id=user_id, text=text, **kwargs)
+            except telegram.error.RetryAfter as e:
+                self.bucket.pause(e.retry_after)
+                with self._lock:
+                    result.retries += 1
+                continue
+            except telegram.error.Unauthorized:
+                with self._lock:
+                    result.blocked.append(user_id)
+                return
+            except Exception as e:
+                logger.error(f"Failed to send message to {user_id}, reason: {e}")
+                with self._lock:
+                    result.failed.append(user_id)
+                return
+
+            with self._lock:
+                result.delivered.append(user_id)
+            return
+
+        logger.error(f"Failed to send message to {user_id}, reason: still rate limited after {attempt} retries")
+        with self._lock:
+            result.failed.append(user_id)
+
+    def broadcast(
+        self,
+        user_ids: Iterable[Union[str, int]],
+        text: str,
+        parse_mode: Optional[str] = telegram.ParseMode.HTML,
+        entities: Optional[List[MessageEntity]] = None,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        update_users: bool = True,
+    ) -> BroadcastResult:
+        """ With update_users=False is_blocked_bot is left to the caller (see save_blocked_status) """
+        result = BroadcastResult()
+        started_at = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='broadcast') as executor:
+            for user_id in user_ids:
+                executor.submit(
+                    self._send, result, int(user_id), text,
+                    parse_mode=parse_mode, entities=entities, reply_markup=reply_markup,
+                )
+
+        result.elapsed = time.monotonic() - started_at
+        if update_users:
+            save_blocked_status(result)
+
+        logger.info(f"Broadcast finished: {result}, bot connections: {get_bot_metrics()}")
+        return result
+
+
+def save_blocked_status(result: BroadcastResult) -> None:
+    """ is_blocked_bot of all recipients with one UPDATE for delivered and one for blocked users """
+    for user_ids, is_blocked_bot in ((result.delivered, False), (result.blocked, True)):
+        for i in range(0, len(user_ids), STATUS_UPDATE_BATCH_SIZE):
+            User.objects.filter(user_id__in=user_ids[i:i + STATUS_UPDATE_BATCH_SIZE]).update(is_blocked_bot=is_blocked_bot)
+
+    for user_id in result.blocked:
+        user_cache.invalidate(user_id)
@@ -9,8 +9,8 @@ from .manage_data import CONFIRM_DECLINE_BROADCAST, CONFIRM_BROADCAST
 from .keyboards import keyboard_confirm_decline_broadcasting
 from .static_text import broadcast_command, broadcast_wrong_format, broadcast_no_access, error_with_html, \
     message_is_sent, declined_message_broadcasting
-from users.models import User
-from users.tasks import broadcast_message
+from users.models import User, BroadcastJob
+from users.tasks import start_broadcast_job
 
 
 def broadcast_command_with_message(update: Update, context: CallbackContext):
@@ -52,28 +52,20 @@ def broadcast_decision_handler(update: Update, context: CallbackContext) -> None
         Shows text in HTML style with two buttons:
         Confirm and Decline
     """
-    broadcast_decision = update.callback_query.data[len(CONFIRM_DECLINE_BROADCAST):]
+    broadcast_decision = CONFIRM_DECLINE_BROADCAST.decode(update.callback_query.data).decision
 
     entities_for_celery = update.callback_query.message.to_dict().get('entities')
     entities, text = update.callback_query.message.entities, update.callback_query.message.text
 
     if broadcast_decision == CONFIRM_BROADCAST:
         admin_text = message_is_sent
-        user_ids = list(User.objects.all().values_list('user_id', flat=True))
+        job = BroadcastJob.objects.create(text=text, entities=entities_for_celery)
 
         if DEBUG:
-            broadcast_message(
-                user_ids=user_ids,
-                text=text,
-                entities=entities_for_celery,
-            )
+            start_broadcast_job(job.pk)
         else:
             # send in async mode via celery
-            broadcast_message.delay(
-                user_ids=user_ids,
-                text=text,
-                entities=entities_for_celery,
-            )
+            start_broadcast_job.delay(job.pk)
     else:
         context.bot.send_message(
             chat_id=update.callback_query.message.chat_id,
@@ -2,12 +2,14 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from tgbot.handlers.broadcast_message.manage_data import CONFIRM_DECLINE_BROADCAST, CONFIRM_BROADCAST, DECLINE_BROADCAST
 from tgbot.handlers.broadcast_message.static_text import confirm_broadcast, decline_broadcast
+from tgbot.handlers.utils.keyboard_cache import cached_keyboard
 
 
+@cached_keyboard('confirm_decline_broadcasting')
 def keyboard_confirm_decline_broadcasting() -> InlineKeyboardMarkup:
     buttons = [[
-        InlineKeyboardButton(confirm_broadcast, callback_data=f'{CONFIRM_DECLINE_BROADCAST}{CONFIRM_BROADCAST}'),
-        InlineKeyboardButton(decline_broadcast, callback_data=f'{CONFIRM_DECLINE_BROADCAST}{DECLINE_BROADCAST}')
+        InlineKeyboardButton(confirm_broadcast, callback_data=CONFIRM_DECLINE_BROADCAST.encode(decision=CONFIRM_BROADCAST)),
+        InlineKeyboardButton(decline_broadcast, callback_data=CONFIRM_DECLINE_BROADCAST.encode(decision=DECLINE_BROADCAST))
     ]]
 
     return InlineKeyboardMarkup(buttons)
@@ -0,0 +1,106 @@
+"""
+    Local stand-in for the Telegram Bot API to measure broadcasts without touching real users.
+    Answers sendMessage after `latency` seconds, refuses chats from `blocked` with 403
+    and answers 429 with retry_after once more than `rate_limit` messages arrive within a second.
+"""
+import json
+import threading
+import time
+
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from typing import Collection, Dict, Optional, Tuple
+
+
+class LocalBotApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 0), latency: float = 0.05,
+                 rate_limit: Optional[float] = None, blocked: Collection[int] = ()) -> None:
+        super().__init__(address, LocalBotApiHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.blocked = frozenset(blocked)
+        self.received = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    def start(self) -> 'LocalBotApiServer':
+        threading.Thread(target=self.serve_forever, name='local-bot-api', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def accept(self) -> bool:
+        """ Count one sendMessage, False when it exceeds the rate limit """
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            if self.rate_limit is not None and len(self._recent) >= self.rate_limit:
+                self.rejected += 1
+                return False
+            self._recent.append(now)
+            self.received += 1
+            return True
+
+
+class LocalBotApiHandler(BaseHTTPRequestHandler):
+    # keep-alive like the real API, so connection reuse of the client is measured too
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: LocalBotApiServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _read_params(self) -> Dict:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body or '{}')
+        return {key: values[0] for key, values in parse_qs(body).items()}
+
+    def _reply(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        params = self._read_params()
+        method = self.path.rsplit('/', 1)[-1]
+        time.sleep(self.server.latency)
+
+        if method == 'getMe':
+            return self._reply(200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'bot', 'username': 'bot'}})
+        if method != 'sendMessage':
+            return self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+
+        if not self.server.accept():
+            return self._reply(429, {
+                'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            })
+
+        chat_id = int(params['chat_id'])
+        if chat_id in self.server.blocked:
+            return self._reply(403, {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'})
+
+        self._reply(200, {'ok': True, 'result': {
+            'message_id': 1, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text'),
+        }})
+
+    do_GET = do_POST
@@ -1,3 +1,5 @@
-CONFIRM_DECLINE_BROADCAST = 'CNFM_DCLN_BRDCST'
+from tgbot.handlers.utils.callback_data import callback_codec, ChoiceField
+
 CONFIRM_BROADCAST = 'CONFIRM'
 DECLINE_BROADCAST = 'DECLINE'
+CONFIRM_DECLINE_BROADCAST = callback_codec.register('bc', ChoiceField('decision', (CONFIRM_BROADCAST, DECLINE_BROADCAST)))
@@ -4,7 +4,9 @@ import telegram
 from telegram import MessageEntity, InlineKeyboardButton, InlineKeyboardMarkup
 
 from dtb.settings import TELEGRAM_TOKEN
+from tgbot.client import get_bot
 from users.models import User
+from users.cache import user_cache
 
 
 def from_celery_markup_to_markup(celery_markup: Optional[List[List[Dict]]]) -> Optional[InlineKeyboardMarkup]:
@@ -52,7 +54,7 @@ def send_one_message(
     entities: Optional[List[MessageEntity]] = None,
     tg_token: str = TELEGRAM_TOKEN,
 ) -> bool:
-    bot = telegram.Bot(tg_token)
+    bot = get_bot(tg_token)
     try:
         m = bot.send_message(
             chat_id=user_id,
@@ -66,8 +68,9 @@ def send_one_message(
     except telegram.error.Unauthorized:
         print(f"Can't send message to {user_id}. Reason: Bot was stopped.")
         User.objects.filter(user_id=user_id).update(is_blocked_bot=True)
+        user_cache.invalidate(user_id)
         success = False
     else:
+        # is_blocked_bot is reset by User.get_user_and_created as soon as the user writes to the bot again
         success = True
-        User.objects.filter(user_id=user_id).update(is_blocked_bot=False)
     return success
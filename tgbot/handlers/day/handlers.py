@@ -4,15 +4,21 @@ import telegram
 from telegram import Update, ParseMode
 from telegram.ext import CallbackContext
 
-from schedules.models import (WorkDay, ProcedureHaircut, ProcedureSimpleColor, ProcedureComplexColor, ProcedureBotox,
-                              ProcedureKeratin, ProcedureLaying, ProcedureCurls, ProcedureHairstyle,
+from schedules.models import (WorkDay, Appointment, ProcedureHaircut, ProcedureSimpleColor, ProcedureComplexColor,
+                              ProcedureBotox, ProcedureKeratin, ProcedureLaying, ProcedureCurls, ProcedureHairstyle,
                               ProcedureHairExtensionsFull, ProcedureHairExtensionsTemple, ProcedureHighlights,
                               Procedure, ProcedureHairCheck)
+from schedules.availability import DayAvailability, get_days_availability
+from schedules.catalog import StagePlan
+from schedules.slots import SlotTakenError
 
 from users.models import User
 
 from tgbot.handlers.utils.decorators import verified_only
 from tgbot.handlers.day import static_text
+from tgbot.handlers.day.manage_data import (PROCEDURE_BUTTON, DATE_BUTTON, CHOICE_BUTTON, CONFIRM_SCHEDULE,
+                                            START_PROCEDURE_BUTTON, SelectWay)
+from tgbot.handlers.day.session import BookingSession, booking_sessions, get_hold_token
 from tgbot.handlers.day.keyboards import keyboard_get_days, keyboard_get_procedures, keyboard_confirm_schedule, \
     keyboard_view_schedule
 from tgbot.handlers.utils.info import extract_user_data_from_update
@@ -40,19 +46,33 @@ def get_available_days(update: Update, context: CallbackContext) -> None:
     user_id = extract_user_data_from_update(update)['user_id']
     current_date = datetime.date.today()
 
-    days = WorkDay.objects.filter(is_visible=True, date__gt=current_date)
-    text = static_text.start_day
+    data = PROCEDURE_BUTTON.decode(update.callback_query.data)
+    select_way: SelectWay = data.select_way
+    procedure_name: str = data.procedure_name
 
-    select_way = update.callback_query.data.split('#')[1] + '#'
-    procedure_name = update.callback_query.data.split('#')[2]
+    procedure_class: Procedure = procedure_classes[procedure_name]
+    user: User = get_procedure_user(user_id, select_way)
+    session = BookingSession(user, select_way, procedure_name, get_procedure_stages(procedure_class, user))
+    days_availability: List[DayAvailability] = get_days_availability(
+        WorkDay.objects.filter(is_visible=True, date__gt=current_date),
+        procedure_class.name_eng,
+        session.plan,
+        user
+    )
+    available_days: List[DayAvailability] = [day for day in days_availability if day.fits]
+
+    text = static_text.start_day if available_days else static_text.no_days_procedure.format(
+        procedure=procedure_class.name_rus
+    )
 
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
         message_id=update.callback_query.message.message_id,
         parse_mode=ParseMode.HTML,
-        reply_markup=keyboard_get_days(days, procedure_name, select_way)
+        reply_markup=keyboard_get_days(available_days, procedure_name, select_way)
     )
+    booking_sessions.set(update.callback_query.message.chat_id, update.callback_query.message.message_id, session)
 
 
 @verified_only
@@ -70,20 +90,12 @@ def get_procedures(update: Update, context: CallbackContext) -> None:
     user_id = extract_user_data_from_update(update)['user_id']
     procedures: List[Procedure] = list(procedure_classes.values())[:-1]
     text: str = static_text.all_procedures
-    select_way: str = update.callback_query.data.split('#')[1] + '#'
-
-    print(f'select_way 1 {select_way}')
+    select_way: SelectWay = START_PROCEDURE_BUTTON.decode(update.callback_query.data).select_way
 
-    if select_way == 'ONEWAY#' or select_way == 'True#':
-        select_way = 'True#'
+    if select_way != SelectWay.CLIENT:
         procedures = list(procedure_classes.values())
-    elif select_way == 'MULTIPLEWAY#' or select_way == 'False#':
-        select_way = 'False#'
-        procedures = list(procedure_classes.values())
-
-    print(f'select_way 2 {select_way}')
 
-    print(update.callback_query.data)
+    print(f'select_way {select_way!r}')
 
     context.bot.edit_message_text(
         text=text,
@@ -94,112 +106,170 @@ def get_procedures(update: Update, context: CallbackContext) -> None:
     )
 
 
-def get_procedure_stages(procedure_class: Procedure, user: User) -> dict:
+def get_procedure_stages(procedure_class: Procedure, user: User) -> StagePlan:
     """
-    Вычисляет этапы процедуры на основе данных пользователя и класса процедуры.
+    Возвращает этапы процедуры из каталога на основе данных пользователя и класса процедуры.
     """
     hair_length = str(user.hair_length)
     hair_density = str(user.hair_density)
     return procedure_class.calculate_duration(hair_length, hair_density)
 
 
-def get_procedure_info(update: Update) -> tuple[str, str, str, Procedure, str, User, dict]:
-    user_id = extract_user_data_from_update(update)['user_id']
-    select_way = update.callback_query.data.split('#')[1] + '#'
-
-    print(select_way)
+def get_procedure_user(user_id: int, select_way: SelectWay) -> User:
+    """
+    Пользователь, для которого подбирается время: админские записи идут от служебных пользователей.
+    """
+    if select_way == SelectWay.ONE_WAY:
+        return User.get_cached(111)
+    elif select_way == SelectWay.MULTIPLE_WAY:
+        return User.get_cached(222)
+    return User.get_cached(user_id)
 
-    if select_way == 'True#':
-        user: User = User.objects.get(user_id=111)
-    elif select_way == 'False#':
-        user: User = User.objects.get(user_id=222)
-    else:
-        user: User = User.objects.get(user_id=user_id)
 
-    print(user)
+def get_booking_session(update: Update, data: tuple) -> BookingSession:
+    """
+    Choices made so far in the booking menu of this message.
+    data: decoded callback_data of a button with select_way, procedure_name and date fields.
+    Without a stored session matching the button the user and stage plan are resolved again.
+    """
+    message = update.callback_query.message
+    session: BookingSession | None = booking_sessions.get(message.chat_id, message.message_id)
+    if session is not None and session.matches(data):
+        return session
 
-    date: str = update.callback_query.data.split('#')[2]
-    procedure_name: str = ' '.join(update.callback_query.data.split('#')[3].split('_'))
-    procedure_class: Procedure = procedure_classes[procedure_name]
-    procedure_stages: dict = get_procedure_stages(procedure_class, user)
-    day: WorkDay = WorkDay.objects.get(date=date)
-    time_slot: Dict[str, str | bool] = day.get_available_time_slot(procedure_stages, user)
-    return user_id, date, procedure_name, procedure_class, select_way, user, time_slot
+    user_id = extract_user_data_from_update(update)['user_id']
+    user: User = get_procedure_user(user_id, data.select_way)
+    session = BookingSession(
+        user, data.select_way, data.procedure_name,
+        get_procedure_stages(procedure_classes[data.procedure_name], user)
+    )
+    session.date = data.date
+    return session
 
 
 def view_schedule(update: Update, context: CallbackContext) -> None:
     print(update.callback_query.data)
-    user_id, date, procedure_name, procedure_class, select_way, _, time_slot = get_procedure_info(update)
+    user_id = extract_user_data_from_update(update)['user_id']
+    data = DATE_BUTTON.decode(update.callback_query.data)
+    session: BookingSession = get_booking_session(update, data)
+    date: datetime.date = data.date
+
+    day: WorkDay = WorkDay.objects.get(date=date)
+    session.set_work_day(day)
+    time_slot: Dict[str, str | bool] = day.get_available_time_slot(session.plan, session.get_user())
+
     if time_slot['cancelled']:
         text = static_text.no_time_procedure.format(
             date=date,
-            procedure=procedure_class.name_rus
+            procedure=procedure_classes[session.procedure_name].name_rus
         )
         context.bot.send_message(chat_id=user_id, text=text)
     else:
-        text = static_text.view_schedule
+        text = static_text.view_schedule.format(date=date)
         context.bot.edit_message_text(
             text=text,
             chat_id=user_id,
             message_id=update.callback_query.message.message_id,
             parse_mode=ParseMode.HTML,
-            reply_markup=keyboard_view_schedule(date, procedure_name, time_slot, select_way)
+            reply_markup=keyboard_view_schedule(date, session.procedure_name, time_slot, session.select_way)
         )
+        booking_sessions.set(update.callback_query.message.chat_id, update.callback_query.message.message_id, session)
 
 
 def confirm_schedule(update: Update, context: CallbackContext) -> None:
     print(update.callback_query.data)
-    user_id, date, procedure_name, procedure_class, select_way, *_ = get_procedure_info(update)
-    procedure_name_rus = procedure_class.name_rus
-    start_time = update.callback_query.data.split('#')[5]
-    end_time = update.callback_query.data.split('#')[6]
-    delete_current_appointment = update.callback_query.data.split('#')[7]
-
-    print(start_time, end_time, delete_current_appointment)
+    user_id = extract_user_data_from_update(update)['user_id']
+    message = update.callback_query.message
+    data = CHOICE_BUTTON.decode(update.callback_query.data)
+    session: BookingSession = get_booking_session(update, data)
+    procedure_name_rus: str = procedure_classes[session.procedure_name].name_rus
+
+    day: WorkDay = session.get_work_day() if session.work_day_id is not None else WorkDay.objects.get(date=data.date)
+    try:
+        # the time stays busy for others while the client confirms it
+        day.hold_appointment(
+            session.get_user(), session.plan, data.start_time, session.procedure_name,
+            get_hold_token(message.chat_id, message.message_id)
+        )
+    except SlotTakenError:
+        context.bot.edit_message_text(
+            text=static_text.slot_taken.format(
+                date=data.date,
+                start_time=data.start_time.strftime('%H:%M'),
+                procedure=procedure_name_rus
+            ),
+            chat_id=user_id,
+            message_id=message.message_id,
+            parse_mode=ParseMode.HTML,
+        )
+        booking_sessions.delete(message.chat_id, message.message_id)
+        return
 
     text = static_text.confirm_information.format(
         username=update.callback_query.from_user.first_name,
-        date=date,
+        date=data.date,
         procedure=procedure_name_rus,
-        start_time=start_time,
-        end_time=end_time,
+        start_time=data.start_time.strftime('%H:%M'),
+        end_time=data.end_time.strftime('%H:%M'),
     )
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
-        message_id=update.callback_query.message.message_id,
+        message_id=message.message_id,
         parse_mode=ParseMode.HTML,
-        reply_markup=keyboard_confirm_schedule(date, procedure_name, start_time, delete_current_appointment, select_way)
+        reply_markup=keyboard_confirm_schedule(data.date, session.procedure_name, data.start_time, session.select_way)
     )
+    session.set_work_day(day)
+    session.start_time, session.end_time = data.start_time, data.end_time
+    booking_sessions.set(message.chat_id, message.message_id, session)
 
 
 def notify_registration(update: Update, context: CallbackContext) -> None:
     print(update.callback_query.data)
-    user_id, date, procedure_name, procedure_class, select_way, user, _ = get_procedure_info(update)
-    start_time = datetime.datetime.strptime(update.callback_query.data.split('#')[4], '%H:%M').time()
-    delete_current_appointment: bool = False if update.callback_query.data.split('#')[5] == 'False' else True
-    procedure_stages = get_procedure_stages(procedure_class, user)
-    day: WorkDay = WorkDay.objects.get(date=date)
-
-    print('delete_current_appointment:', delete_current_appointment)
-
-    day.make_appointment(user, procedure_stages, delete_current_appointment, start_time, procedure_name)
+    user_id = extract_user_data_from_update(update)['user_id']
+    message = update.callback_query.message
+    data = CONFIRM_SCHEDULE.decode(update.callback_query.data)
+    start_time: datetime.time = data.start_time
     text = static_text.notify_registration
+
+    if not Appointment.confirm_hold(get_hold_token(message.chat_id, message.message_id)):
+        session: BookingSession = get_booking_session(update, data)
+        day: WorkDay = session.get_work_day() if session.work_day_id is not None else \
+            WorkDay.objects.get(date=data.date)
+        user: User = session.get_user()
+        try:
+            # a second tap on "confirm" finds the hold already confirmed,
+            # otherwise the hold has expired: book the time if it is still free
+            if not day.has_booking(user, start_time, session.procedure_name):
+                day.make_appointment(user, session.plan, start_time, session.procedure_name)
+        except SlotTakenError:
+            text = static_text.slot_taken.format(
+                date=data.date,
+                start_time=start_time.strftime('%H:%M'),
+                procedure=procedure_classes[session.procedure_name].name_rus
+            )
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
-        message_id=update.callback_query.message.message_id,
+        message_id=message.message_id,
         parse_mode=ParseMode.HTML,
     )
+    booking_sessions.delete(message.chat_id, message.message_id)
 
 
 def notify_decline_schedule(update: Update, context: CallbackContext) -> None:
     print(update.callback_query.data)
     user_id = extract_user_data_from_update(update)['user_id']
+    message = update.callback_query.message
+    hold_token: str = get_hold_token(message.chat_id, message.message_id)
+    for day in WorkDay.objects.filter(appointments__hold_token=hold_token).distinct():
+        day.release_hold(hold_token)
+
     text = static_text.notify_decline_schedule
     context.bot.edit_message_text(
         text=text,
         chat_id=user_id,
-        message_id=update.callback_query.message.message_id,
+        message_id=message.message_id,
         parse_mode=ParseMode.HTML,
     )
+    booking_sessions.delete(message.chat_id, message.message_id)
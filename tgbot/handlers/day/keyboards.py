@@ -1,59 +1,76 @@
+from datetime import date as Date, time
+
 from typing import List
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from tgbot.handlers.day.manage_data import PROCEDURE_BUTTON, DATE_BUTTON, CONFIRM_SCHEDULE, DECLINE_SCHEDULE, CONFIRM_DECLINE_SCHEDULE, CHOICE_BUTTON, TIME_SLOT, START_PROCEDURE_BUTTON
-from tgbot.handlers.day.static_text import confirm_schedule, decline_schedule
+from tgbot.handlers.day.manage_data import (PROCEDURE_BUTTON, DATE_BUTTON, CONFIRM_SCHEDULE, DECLINE_SCHEDULE, CHOICE_BUTTON,
+                                            START_PROCEDURE_BUTTON, SelectWay)
+from tgbot.handlers.day.static_text import confirm_schedule, decline_schedule, day_from_time
+from tgbot.handlers.utils.keyboard_cache import cached_keyboard
 
-from schedules.models import WorkDay, Procedure
+from schedules.availability import DayAvailability
+from schedules.models import Procedure
 
 
-def keyboard_get_procedures(procedures: List[Procedure], select_way: str = '#') -> InlineKeyboardMarkup:
+@cached_keyboard('procedures', key=lambda procedures, select_way=SelectWay.CLIENT: (
+    tuple(procedure.name_eng for procedure in procedures), select_way,
+))
+def keyboard_get_procedures(procedures: List[Procedure],
+                            select_way: SelectWay = SelectWay.CLIENT) -> InlineKeyboardMarkup:
     buttons = [
-        [InlineKeyboardButton(procedure.name_rus, callback_data=f'{PROCEDURE_BUTTON}{select_way}{procedure.get_underline_name()}')] for procedure in procedures
+        [InlineKeyboardButton(
+            procedure.name_rus,
+            callback_data=PROCEDURE_BUTTON.encode(select_way=select_way, procedure_name=procedure.name_eng)
+        )] for procedure in procedures
     ]
 
     return InlineKeyboardMarkup(buttons)
 
 
-def keyboard_get_days(days: WorkDay, procedure_name: str, select_way: str) -> InlineKeyboardMarkup:
+def keyboard_get_days(days: List[DayAvailability], procedure_name: str, select_way: SelectWay) -> InlineKeyboardMarkup:
     buttons = [
-        [InlineKeyboardButton(day.date.strftime('%d.%m.%Y'), callback_data=f'{DATE_BUTTON}{select_way}{day.date}#{procedure_name}')] for day in days
-     ]
+        [InlineKeyboardButton(
+            day_from_time.format(date=day.day.date.strftime('%d.%m.%Y'), start_time=day.get_earliest_start_str()),
+            callback_data=DATE_BUTTON.encode(select_way=select_way, date=day.day.date, procedure_name=procedure_name)
+        )] for day in days
+    ]
 
-    buttons.append([InlineKeyboardButton('⬅ Назад', callback_data=f'{START_PROCEDURE_BUTTON}{select_way}')])
+    buttons.append([InlineKeyboardButton('⬅ Назад', callback_data=START_PROCEDURE_BUTTON.encode(select_way=select_way))])
 
     return InlineKeyboardMarkup(buttons)
 
 
-def keyboard_view_schedule(date: str, procedure_name: str, time_slot: dict, select_way: str) -> InlineKeyboardMarkup:
-    print(f'{CHOICE_BUTTON}{select_way}{date}#{procedure_name}#'
-          f'{TIME_SLOT}{time_slot["start_time"]}#{time_slot["end_time"]}#'
-          f'{str(time_slot["delete_current_appointment"])}')
-
-    buttons = [
-        [InlineKeyboardButton(
-            f'{date} --- {time_slot["start_time"]} - {time_slot["end_time"]}',
-            callback_data=f'{CHOICE_BUTTON}{select_way}{date}#{procedure_name}#'
-                          f'{TIME_SLOT}{time_slot["start_time"]}#{time_slot["end_time"]}#'
-                          f'{str(time_slot["delete_current_appointment"])}'
-        )],
-        [InlineKeyboardButton('⬅ Назад', callback_data=f'{PROCEDURE_BUTTON}{select_way}{procedure_name}')]
+def keyboard_view_schedule(date: Date, procedure_name: str, time_slot: dict, select_way: SelectWay,
+                           row_width: int = 2) -> InlineKeyboardMarkup:
+    slot_buttons = [
+        InlineKeyboardButton(
+            f'{slot["start_time"]} - {slot["end_time"]}',
+            callback_data=CHOICE_BUTTON.encode(
+                select_way=select_way, date=date, procedure_name=procedure_name,
+                start_time=slot['start_time'], end_time=slot['end_time'],
+            )
+        ) for slot in time_slot['slots']
     ]
 
+    buttons = [slot_buttons[index:index + row_width] for index in range(0, len(slot_buttons), row_width)]
+    buttons.append([InlineKeyboardButton(
+        '⬅ Назад', callback_data=PROCEDURE_BUTTON.encode(select_way=select_way, procedure_name=procedure_name)
+    )])
+
     return InlineKeyboardMarkup(buttons)
 
 
-def keyboard_confirm_schedule(date: str, procedure_name: str, start_time: str,
-                              delete_current_appointment: str, select_way: str) -> InlineKeyboardMarkup:
+def keyboard_confirm_schedule(date: Date, procedure_name: str, start_time: time,
+                              select_way: SelectWay) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(
             confirm_schedule,
-            callback_data=f'{CONFIRM_DECLINE_SCHEDULE}{CONFIRM_SCHEDULE}{select_way}{date}#{procedure_name}#'
-                          f'{start_time}#'
-                          f'{delete_current_appointment}'
+            callback_data=CONFIRM_SCHEDULE.encode(
+                select_way=select_way, date=date, procedure_name=procedure_name, start_time=start_time,
+            )
         )],
-        [InlineKeyboardButton(decline_schedule, callback_data=f'{CONFIRM_DECLINE_SCHEDULE}{DECLINE_SCHEDULE}{select_way}')]
+        [InlineKeyboardButton(decline_schedule, callback_data=DECLINE_SCHEDULE.encode(select_way=select_way))]
     ]
 
     return InlineKeyboardMarkup(buttons)
@@ -1,10 +1,30 @@
-PROCEDURE_BUTTON = 'PROCEDURE#'
-DATE_BUTTON = 'DATE#'
-CONFIRM_DECLINE_SCHEDULE = 'SCHEDULE'
-CONFIRM_SCHEDULE = 'CONFIRM#'
-DECLINE_SCHEDULE = 'DECLINE#'
-CHOICE_BUTTON = 'CHOICE#'
-TIME_SLOT = 'TMESLT#'
-START_PROCEDURE_BUTTON = 'STARTPROCEDUREBUTTON#'
-LOW_BUTTON = ''
+from enum import IntEnum
 
+from typing import Tuple
+
+from tgbot.handlers.utils.callback_data import callback_codec, ChoiceField, DateField, EnumField, TimeField
+
+
+class SelectWay(IntEnum):
+    """ For whom the time is chosen: the client or a service user of the admin (/appointment_user) """
+    CLIENT = 0
+    ONE_WAY = 1
+    MULTIPLE_WAY = 2
+
+
+# the index of a procedure is sent in callback_data: only append to this tuple
+PROCEDURE_NAMES: Tuple[str, ...] = (
+    'Haircut', 'Simple Color', 'Complex Color', 'Botox', 'Keratin', 'Laying', 'Curls', 'Hairstyle',
+    'Hair ext full', 'Hair ext temple', 'Highlights', 'Hair check',
+)
+
+SELECT_WAY = EnumField('select_way', SelectWay)
+PROCEDURE = ChoiceField('procedure_name', PROCEDURE_NAMES)
+DATE = DateField('date')
+
+START_PROCEDURE_BUTTON = callback_codec.register('sp', SELECT_WAY)
+PROCEDURE_BUTTON = callback_codec.register('pr', SELECT_WAY, PROCEDURE)
+DATE_BUTTON = callback_codec.register('dt', SELECT_WAY, DATE, PROCEDURE)
+CHOICE_BUTTON = callback_codec.register('ch', SELECT_WAY, DATE, PROCEDURE, TimeField('start_time'), TimeField('end_time'))
+CONFIRM_SCHEDULE = callback_codec.register('sc', SELECT_WAY, DATE, PROCEDURE, TimeField('start_time'))
+DECLINE_SCHEDULE = callback_codec.register('sd', SELECT_WAY)
@@ -0,0 +1,189 @@
+"""
+    Booking sessions: what the client has chosen so far in one booking menu message.
+    Keyed by (chat_id, message_id), the message every step of the booking edits.
+    In-process LRU with TTL, optionally shared through the project Redis so that the next step
+    may be handled by another process. A session is only used when it matches the pressed button,
+    otherwise the step resolves everything again, so a lost or stale session costs queries, not correctness.
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+
+from typing import Dict, Optional, Tuple
+
+from dtb.settings import REDIS_URL, BOOKING_SESSION_MAXSIZE, BOOKING_SESSION_TTL, BOOKING_SESSION_USE_REDIS
+from schedules.catalog import StagePlan
+from schedules.models import WorkDay
+from users.models import User
+
+from tgbot.handlers.day.manage_data import SelectWay
+
+logger = logging.getLogger(__name__)
+
+
+class BookingSession:
+    __slots__ = ('user_id', 'user_first_name', 'select_way', 'procedure_name', 'plan',
+                 'date', 'work_day_id', 'work_hours', 'start_time', 'end_time')
+
+    def __init__(self, user: User, select_way: SelectWay, procedure_name: str, plan: StagePlan) -> None:
+        self.user_id: int = user.user_id
+        self.user_first_name: str = user.first_name
+        self.select_way = select_way
+        self.procedure_name = procedure_name
+        self.plan = plan
+        # set once a day is shown
+        self.date: Optional[datetime.date] = None
+        self.work_day_id: Optional[int] = None
+        self.work_hours: Optional[Tuple[datetime.time, datetime.time]] = None
+        # set once a time is chosen
+        self.start_time: Optional[datetime.time] = None
+        self.end_time: Optional[datetime.time] = None
+
+    def matches(self, data: tuple) -> bool:
+        """
+        data: decoded callback_data with select_way and procedure_name, optionally date and start_time.
+        The choices already made must be the ones on the button, the rest is chosen by it.
+        """
+        if self.select_way != data.select_way or self.procedure_name != data.procedure_name:
+            return False
+        for field in ('date', 'start_time'):
+            value = getattr(self, field)
+            if value is not None and getattr(data, field, value) != value:
+                return False
+        return True
+
+    def get_user(self) -> User:
+        """ The fields the booking needs (pk, first_name), others are loaded on access """
+        return User.from_db('default', ['user_id', 'first_name'], [self.user_id, self.user_first_name])
+
+    def set_work_day(self, day: WorkDay) -> None:
+        self.date = day.date
+        self.work_day_id = day.pk
+        self.work_hours = (day.work_hour_start, day.work_hour_end)
+
+    def get_work_day(self) -> WorkDay:
+        """ The shown day without its bitmaps: enough for make_appointment, which re-reads the row under lock """
+        return WorkDay.from_db(
+            'default', ['id', 'date', 'work_hour_start', 'work_hour_end'], [self.work_day_id, self.date, *self.work_hours]
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'user_id': self.user_id,
+            'user_first_name': self.user_first_name,
+            'select_way': int(self.select_way),
+            'procedure_name': self.procedure_name,
+            'plan': [self.plan.minutes, self.plan.waiting, self.plan.fills_waiting],
+            'date': self.date.isoformat() if self.date else None,
+            'work_day_id': self.work_day_id,
+            'work_hours': [t.isoformat() for t in self.work_hours] if self.work_hours else None,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+        }
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> 'BookingSession':
+        session = cls.__new__(cls)
+        minutes, waiting, fills_waiting = values['plan']
+        session.user_id = values['user_id']
+        session.user_first_name = values['user_first_name']
+        session.select_way = SelectWay(values['select_way'])
+        session.procedure_name = values['procedure_name']
+        session.plan = StagePlan(tuple(minutes), tuple(waiting), fills_waiting)
+        session.date = datetime.date.fromisoformat(values['date']) if values['date'] else None
+        session.work_day_id = values['work_day_id']
+        session.work_hours = tuple(datetime.time.fromisoformat(t) for t in values['work_hours']) \
+            if values['work_hours'] else None
+        session.start_time = datetime.time.fromisoformat(values['start_time']) if values['start_time'] else None
+        session.end_time = datetime.time.fromisoformat(values['end_time']) if values['end_time'] else None
+        return session
+
+
+def get_hold_token(chat_id: int, message_id: int) -> str:
+    """ Slot hold of the booking menu in this message (WorkDay.hold_appointment) """
+    return f'{chat_id}:{message_id}'
+
+
+class BookingSessionStore:
+    """ (chat_id, message_id) -> session values; sessions are stored as dicts, every get returns a fresh copy """
+
+    def __init__(self, maxsize: int, ttl: float, redis_client=None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis = redis_client
+        self._entries: OrderedDict[Tuple[int, int], Tuple[float, Dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(chat_id: int, message_id: int) -> str:
+        return f'booking_session:{chat_id}:{message_id}'
+
+    def get(self, chat_id: int, message_id: int) -> Optional[BookingSession]:
+        with self._lock:
+            entry = self._entries.get((chat_id, message_id))
+            if entry is not None:
+                expires_at, values = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end((chat_id, message_id))
+                    return BookingSession.from_dict(values)
+                del self._entries[(chat_id, message_id)]
+
+        if self.redis is not None:
+            try:
+                payload = self.redis.get(self._key(chat_id, message_id))
+            except Exception as e:
+                logger.warning(f'Booking sessions: redis is unavailable ({e})')
+                payload = None
+
+            if payload is not None:
+                values = json.loads(payload)
+                self._store(chat_id, message_id, values)
+                return BookingSession.from_dict(values)
+
+        return None
+
+    def _store(self, chat_id: int, message_id: int, values: Dict) -> None:
+        with self._lock:
+            self._entries[(chat_id, message_id)] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end((chat_id, message_id))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, chat_id: int, message_id: int, session: BookingSession) -> None:
+        values = session.to_dict()
+        self._store(chat_id, message_id, values)
+
+        if self.redis is not None:
+            try:
+                self.redis.set(self._key(chat_id, message_id), json.dumps(values), ex=int(self.ttl))
+            except Exception as e:
+                logger.warning(f'Booking sessions: redis is unavailable ({e})')
+
+    def delete(self, chat_id: int, message_id: int) -> None:
+        with self._lock:
+            self._entries.pop((chat_id, message_id), None)
+
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._key(chat_id, message_id))
+            except Exception as e:
+                logger.warning(f'Booking sessions: redis is unavailable ({e})')
+
+
+def _get_redis_client():
+    if not BOOKING_SESSION_USE_REDIS:
+        return None
+
+    import redis
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=0.5)
+
+
+booking_sessions = BookingSessionStore(
+    maxsize=BOOKING_SESSION_MAXSIZE,
+    ttl=BOOKING_SESSION_TTL,
+    redis_client=_get_redis_client(),
+)
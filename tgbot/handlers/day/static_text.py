@@ -1,12 +1,17 @@
 start_day = "Вот доступные дни для процедур"
+day_from_time = "{date} · с {start_time}"
+no_days_procedure = "Сейчас нет свободных дней для процедуры: {procedure} 😟\n" \
+                    "Попробуйте выбрать другую процедуру 🚀"
 all_procedures = "Все доступные процедуры:"
 confirm_schedule = "Да"
 decline_schedule = "Нет"
 confirm_information = "{username}, верны ли данные \n" \
                       "Дата и время: {date} -- {start_time} - {end_time}\n" \
                       "Процедура: {procedure}"
-view_schedule = "Доступное время для вас"
+view_schedule = "Доступное время для вас на {date}"
 notify_registration = "Вы успешно записались"
+slot_taken = "Время {date} {start_time} для процедуры {procedure} уже занято 😟\n" \
+             "Пока вы подтверждали запись, это время выбрал другой клиент. Выберите другое время 🔄"
 notify_decline_schedule = "Что-то пошло не так, попробуйте перезаписаться 🔄"
 no_time_procedure = "{date} нету времени на данную процедуру: {procedure} 😟\n" \
                     "Попробуйте записаться на другой день 🚀"
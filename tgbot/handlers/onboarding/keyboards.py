@@ -2,12 +2,14 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from tgbot.handlers.onboarding.manage_data import SECRET_LEVEL_BUTTON
 from tgbot.handlers.onboarding.static_text import github_button_text, secret_level_button_text
+from tgbot.handlers.utils.keyboard_cache import cached_keyboard
 
 
+@cached_keyboard('start')
 def make_keyboard_for_start_command() -> InlineKeyboardMarkup:
     buttons = [[
         InlineKeyboardButton(github_button_text, url="https://github.com/ohld/django-telegram-bot"),
-        InlineKeyboardButton(secret_level_button_text, callback_data=f'{SECRET_LEVEL_BUTTON}')
+        InlineKeyboardButton(secret_level_button_text, callback_data=SECRET_LEVEL_BUTTON.encode())
     ]]
 
     return InlineKeyboardMarkup(buttons)
@@ -1 +1,3 @@
-SECRET_LEVEL_BUTTON = 'SCRT_LVL'
+from tgbot.handlers.utils.callback_data import callback_codec
+
+SECRET_LEVEL_BUTTON = callback_codec.register('sl')
@@ -0,0 +1,181 @@
+"""
+    Compact callback_data for inline buttons.
+    Every button type has a schema: a short tag and typed fields packed with struct and base64-encoded,
+    e.g. 'ch:AQEivAICWAMq' instead of 'CHOICE#True#2024-05-06#Complex_Color#TMESLT#10:00#13:30'.
+    The first packed byte is the schema version, buttons of an older version are refused on decode.
+"""
+import base64
+import binascii
+import re
+import struct
+
+from collections import namedtuple
+from datetime import date, time, timedelta
+from enum import Enum
+
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+# Telegram refuses callback_data longer than this
+MAX_CALLBACK_DATA_LENGTH = 64
+SEPARATOR = ':'
+
+_EPOCH = date(2000, 1, 1)
+
+
+class CallbackDataError(ValueError):
+    """ A value can't be packed, or callback_data wasn't produced by the current schema """
+
+
+class Field:
+    """ A value stored in a struct field as an integer """
+    fmt: str = 'B'
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def to_int(self, value: Any) -> int:
+        return int(value)
+
+    def from_int(self, value: int) -> Any:
+        return value
+
+
+class ChoiceField(Field):
+    """ One of a fixed tuple of values, stored as its index: only append to `choices` """
+
+    def __init__(self, name: str, choices: Iterable) -> None:
+        super().__init__(name)
+        self.choices: Tuple = tuple(choices)
+        self._indexes: Dict[Any, int] = {choice: index for index, choice in enumerate(self.choices)}
+        if len(self.choices) > 256:
+            raise ValueError(f'{name}: a choice field holds at most 256 values')
+
+    def to_int(self, value: Any) -> int:
+        try:
+            return self._indexes[value]
+        except KeyError:
+            raise CallbackDataError(f'{self.name}: unknown choice {value!r}') from None
+
+    def from_int(self, value: int) -> Any:
+        try:
+            return self.choices[value]
+        except IndexError:
+            raise CallbackDataError(f'{self.name}: unknown choice index {value}') from None
+
+
+class EnumField(Field):
+    """ Enum with small integer values (IntEnum, django_enumfield) """
+
+    def __init__(self, name: str, enum_class: Type[Enum]) -> None:
+        super().__init__(name)
+        self.enum_class = enum_class
+
+    def to_int(self, value: Any) -> int:
+        return int(self.enum_class(value).value)
+
+    def from_int(self, value: int) -> Enum:
+        try:
+            return self.enum_class(value)
+        except ValueError:
+            raise CallbackDataError(f'{self.name}: unknown value {value}') from None
+
+
+class DateField(Field):
+    """ Days since 2000-01-01 """
+    fmt = 'H'
+
+    def to_int(self, value: Any) -> int:
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        return (value - _EPOCH).days
+
+    def from_int(self, value: int) -> date:
+        return _EPOCH + timedelta(days=value)
+
+
+class TimeField(Field):
+    """ Minutes since midnight """
+    fmt = 'H'
+
+    def to_int(self, value: Any) -> int:
+        if isinstance(value, str):
+            value = time.fromisoformat(value)
+        return value.hour * 60 + value.minute
+
+    def from_int(self, value: int) -> time:
+        return time(value // 60, value % 60)
+
+
+class CallbackSchema:
+    """ Encodes one button type to '<tag>:<base64>' and decodes it back into a namedtuple """
+    __slots__ = ('tag', 'version', 'fields', 'type', '_struct', '_prefix')
+
+    def __init__(self, tag: str, fields: Tuple[Field, ...], version: int = 1) -> None:
+        self.tag = tag
+        self.version = version
+        self.fields = fields
+        self.type = namedtuple(f'{tag.capitalize()}Callback', [field.name for field in fields])
+        self._struct = struct.Struct('>B' + ''.join(field.fmt for field in fields))
+        self._prefix = f'{tag}{SEPARATOR}'
+
+        if self.max_length > MAX_CALLBACK_DATA_LENGTH:
+            raise ValueError(f'{tag}: encoded callback_data may take {self.max_length} bytes')
+
+    @property
+    def max_length(self) -> int:
+        return len(self._prefix.encode()) + -(-self._struct.size // 3) * 4
+
+    @property
+    def pattern(self) -> str:
+        """ For CallbackQueryHandler(pattern=...) """
+        return f'^{re.escape(self._prefix)}'
+
+    def encode(self, **values: Any) -> str:
+        try:
+            packed = self._struct.pack(self.version, *(field.to_int(values[field.name]) for field in self.fields))
+        except (KeyError, struct.error) as e:
+            raise CallbackDataError(f'{self.tag}: can not encode {values} ({e})') from None
+        return self._prefix + base64.urlsafe_b64encode(packed).rstrip(b'=').decode()
+
+    def decode(self, data: str) -> tuple:
+        if not data.startswith(self._prefix):
+            raise CallbackDataError(f'{self.tag}: foreign callback_data {data!r}')
+
+        payload = data[len(self._prefix):]
+        try:
+            version, *values = self._struct.unpack(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        except (binascii.Error, struct.error):
+            raise CallbackDataError(f'{self.tag}: malformed callback_data {data!r}') from None
+        if version != self.version:
+            raise CallbackDataError(f'{self.tag}: outdated callback_data (version {version})')
+        return self.type(*(field.from_int(value) for field, value in zip(self.fields, values)))
+
+
+class CallbackCodec:
+    """ Registry of button schemas, tags are unique """
+
+    def __init__(self) -> None:
+        self.schemas: Dict[str, CallbackSchema] = {}
+
+    def register(self, tag: str, *fields: Field, version: int = 1) -> CallbackSchema:
+        if not tag or SEPARATOR in tag:
+            raise ValueError(f'Callback tag {tag!r} must be non-empty and must not contain {SEPARATOR!r}')
+        if tag in self.schemas:
+            raise ValueError(f'Callback tag {tag!r} is already registered')
+
+        schema = CallbackSchema(tag, fields, version)
+        self.schemas[tag] = schema
+        return schema
+
+    def get_schema(self, data: str) -> Optional[CallbackSchema]:
+        tag, separator, _ = data.partition(SEPARATOR)
+        return self.schemas.get(tag) if separator else None
+
+    def decode(self, data: str) -> tuple:
+        schema = self.get_schema(data)
+        if schema is None:
+            raise CallbackDataError(f'Unknown callback_data {data!r}')
+        return schema.decode(data)
+
+
+callback_codec = CallbackCodec()
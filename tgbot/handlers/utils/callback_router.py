@@ -0,0 +1,70 @@
+"""
+    One handler for all inline buttons.
+    callback_data is routed by its tag (see callback_data.py) with a single dict lookup,
+    instead of testing the regex of every CallbackQueryHandler in turn.
+"""
+import re
+
+from typing import Callable, Dict, Optional, Union
+
+from telegram import Update
+from telegram.ext import CallbackContext, CallbackQueryHandler, Dispatcher, Handler
+
+from tgbot.handlers.utils.callback_data import CallbackSchema, SEPARATOR
+
+RouteCallback = Callable[[Update, CallbackContext], None]
+
+
+class AmbiguousRouteError(ValueError):
+    """ Two handlers claim the same callback_data """
+
+
+class CallbackRouter(Handler):
+    def __init__(self) -> None:
+        super().__init__(self.route)
+        self.routes: Dict[str, RouteCallback] = {}
+
+    def add_route(self, schema: Union[CallbackSchema, str], callback: RouteCallback) -> None:
+        tag = schema.tag if isinstance(schema, CallbackSchema) else schema
+        if SEPARATOR in tag:
+            raise AmbiguousRouteError(f'Callback tag {tag!r} must not contain {SEPARATOR!r}')
+        if tag in self.routes:
+            raise AmbiguousRouteError(
+                f'Callback tag {tag!r} is routed to both {self.routes[tag].__qualname__} and {callback.__qualname__}'
+            )
+        self.routes[tag] = callback
+
+    def check_update(self, update: object) -> Optional[RouteCallback]:
+        if isinstance(update, Update) and update.callback_query and update.callback_query.data:
+            return self.routes.get(update.callback_query.data.partition(SEPARATOR)[0])
+        return None
+
+    def handle_update(self, update: Update, dispatcher: Dispatcher, check_result: RouteCallback,
+                      context: CallbackContext = None) -> None:
+        return check_result(update, context)
+
+    def route(self, update: Update, context: CallbackContext) -> None:
+        """ Callback required by Handler, routing happens in check_update """
+        callback = self.check_update(update)
+        if callback is not None:
+            callback(update, context)
+
+    def check_conflicts(self, dispatcher: Dispatcher) -> None:
+        """
+        Fails at startup if a CallbackQueryHandler registered next to the router would also take routed buttons:
+        whichever comes first in its group would silently win.
+        """
+        for group, handlers in dispatcher.handlers.items():
+            for handler in handlers:
+                if not isinstance(handler, CallbackQueryHandler):
+                    continue
+                if handler.pattern is not None and not isinstance(handler.pattern, re.Pattern):
+                    # callable or type patterns look at the decoded data and can't be checked here
+                    continue
+                for tag, callback in self.routes.items():
+                    if handler.pattern is None or handler.pattern.match(f'{tag}{SEPARATOR}'):
+                        pattern = handler.pattern.pattern if handler.pattern is not None else None
+                        raise AmbiguousRouteError(
+                            f'CallbackQueryHandler({handler.callback.__qualname__}, pattern={pattern!r}) '
+                            f'in group {group} also matches {tag!r} routed to {callback.__qualname__}'
+                        )
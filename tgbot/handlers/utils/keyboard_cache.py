@@ -0,0 +1,42 @@
+"""
+    Serialized reply_markup of static menus.
+    Bot methods take the JSON string as reply_markup as is, so a cached menu is sent without building any buttons.
+"""
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+
+class KeyboardCache:
+    """
+    Menu JSON keyed by (menu, arguments).
+    Menus are built from static texts and the procedure catalog, both fixed for the life of the process,
+    so entries never go stale; two threads building the same menu at once just store equal JSON.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple, str] = {}
+
+    def get(self, key: Tuple, build: Callable[[], InlineKeyboardMarkup]) -> str:
+        markup = self._entries.get(key)
+        if markup is None:
+            markup = self._entries[key] = build().to_json()
+        return markup
+
+
+keyboard_cache = KeyboardCache()
+
+
+def cached_keyboard(menu: str, key: Optional[Callable[..., Tuple]] = None) -> Callable:
+    """
+    The decorated keyboard returns its JSON from keyboard_cache, built once per distinct arguments.
+    `key` maps unhashable arguments (e.g. a list of procedures) to a hashable tuple.
+    """
+    def decorator(build: Callable[..., InlineKeyboardMarkup]) -> Callable[..., str]:
+        @wraps(build)
+        def wrapper(*args, **kwargs) -> str:
+            arguments = key(*args, **kwargs) if key is not None else (*args, *sorted(kwargs.items()))
+            return keyboard_cache.get((menu, *arguments), lambda: build(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -1,17 +1,9 @@
-import logging
-import sys
+from tgbot.client import get_bot, load_cached_bot_info
 
-import telegram
-from telegram import Bot
 
-from dtb.settings import TELEGRAM_TOKEN
-
-
-bot = Bot(TELEGRAM_TOKEN)
-TELEGRAM_BOT_USERNAME = bot.get_me()["username"]
-# Global variable - the best way I found to init Telegram bot
-try:
-    pass
-except telegram.error.Unauthorized:
-    logging.error("Invalid TELEGRAM_TOKEN.")
-    sys.exit(1)
+# Global variable - the best way I found to init Telegram bot.
+# No requests are made here: the bot's info is fetched lazily, see tgbot.client.get_bot_info
+bot = get_bot()
+# webhook and celery processes never ask for the username themselves: take it from the cache file now,
+# so that the first bot.username (CommandHandler) doesn't call getMe
+load_cached_bot_info()
@@ -0,0 +1,287 @@
+"""
+    In-process execution of webhook updates.
+    Updates are queued to a bounded pool of threads of the web process, skipping the Celery round trip;
+    when a chat's queue stays full the update is refused and Telegram delivers it again
+    (backpressure instead of unbounded memory, without reordering the chat's updates).
+    Updates of one chat are processed one at a time in both paths, see UpdateExecutor and ChatLocks.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# a chat with a refused update stays closed at most this many seconds (Telegram may give up re-delivering it)
+STALLED_CHAT_TTL = 600
+
+
+class LatencyHistogram:
+    """ Cumulative-bucket histogram (Prometheus style) of latencies in seconds """
+    BUCKETS: Tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self) -> None:
+        self._counts: List[int] = [0] * (len(self.BUCKETS) + 1)
+        self._sum = 0.0
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> int:
+        """ Returns the number of observations so far """
+        with self._lock:
+            self._counts[bisect_left(self.BUCKETS, seconds)] += 1
+            self._sum += seconds
+            self._total += 1
+            return self._total
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+
+        buckets, cumulative = {}, 0
+        for bound, count in zip((*self.BUCKETS, float('inf')), counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {'buckets': buckets, 'count': cumulative, 'sum': total}
+
+
+# webhook received -> update processed, per execution path
+latency: Dict[str, LatencyHistogram] = {
+    'inprocess': LatencyHistogram(),
+    'celery': LatencyHistogram(),
+}
+
+# every process logs its histogram once per this many updates: celery workers have no metrics endpoint
+REPORT_EVERY = 1000
+
+
+def observe_latency(path: str, received_at: float) -> None:
+    histogram = latency[path]
+    if histogram.observe(time.time() - received_at) % REPORT_EVERY == 0:
+        logger.info(f"Webhook latency ({path}): {histogram.snapshot()}")
+
+
+def get_chat_id(update_json: Dict) -> Optional[int]:
+    """ Chat of a raw update, like Update.effective_chat (falls back to the sender for chat-less updates) """
+    for key, payload in update_json.items():
+        if key == 'update_id' or not isinstance(payload, dict):
+            continue
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat') or payload.get('from') or payload.get('user')
+        if chat:
+            return chat['id']
+    return None
+
+
+class UpdateDeduplicator:
+    """
+    Drops updates Telegram delivers again (it re-sends a webhook until it gets a 2xx answer).
+    Recent update_ids are remembered in a bounded local set and, to cover all web processes, in redis with SET NX.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, redis_client=None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis = redis_client
+        self.duplicates = 0
+        self._seen: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(update_id: int) -> str:
+        return f'webhook_update:{update_id}'
+
+    def is_duplicate(self, update_id: int) -> bool:
+        """ Remembers update_id, True when it was already seen """
+        with self._lock:
+            duplicate = update_id in self._seen
+            if not duplicate:
+                self._seen[update_id] = None
+                if len(self._seen) > self.maxsize:
+                    self._seen.popitem(last=False)
+
+        if not duplicate and self.redis is not None:
+            try:
+                duplicate = not self.redis.set(self._key(update_id), 1, nx=True, ex=self.ttl)
+            except Exception as e:
+                logger.warning(f'Update dedup: redis is unavailable ({e})')
+
+        if duplicate:
+            with self._lock:
+                self.duplicates += 1
+        return duplicate
+
+    def forget(self, update_id: int) -> None:
+        """ The update was not accepted after all: let its re-delivery through """
+        with self._lock:
+            self._seen.pop(update_id, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._key(update_id))
+            except Exception as e:
+                logger.warning(f'Update dedup: redis is unavailable ({e})')
+
+
+class ChatLockTimeout(Exception):
+    """ Another update of the chat kept its lock longer than ChatLocks.blocking_timeout """
+
+    def __init__(self, chat_id: int) -> None:
+        self.chat_id = chat_id
+        super().__init__(f'Timed out waiting for the lock of chat {chat_id}')
+
+
+class ChatLocks:
+    """
+    Redis lock per chat: updates of one chat never run at the same time in different processes
+    (gunicorn workers of the in-process mode, celery workers).
+    An update that can't get the lock in time is never run without it: hold() raises ChatLockTimeout
+    and the caller tries again later (the lock itself expires after `timeout` seconds).
+    """
+
+    def __init__(self, redis_client, timeout: float, blocking_timeout: float) -> None:
+        self.redis = redis_client
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+
+    @contextmanager
+    def hold(self, chat_id: Optional[int]):
+        if chat_id is None:
+            yield
+            return
+
+        lock = self.redis.lock(f'chat_lock:{chat_id}', timeout=self.timeout, blocking_timeout=self.blocking_timeout)
+        try:
+            acquired = lock.acquire()
+        except Exception as e:
+            # no redis - no locks for anyone, waiting would stop the bot
+            logger.warning(f'Chat lock: redis is unavailable ({e}), processing chat {chat_id} without the lock')
+            acquired = False
+        else:
+            if not acquired:
+                logger.warning(f'Chat lock: timed out after {self.blocking_timeout}s waiting for chat {chat_id}')
+                raise ChatLockTimeout(chat_id)
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception as e:
+                    # expired after `timeout` seconds and may belong to another update by now
+                    logger.warning(f'Chat lock: failed to release lock of chat {chat_id} ({e})')
+
+
+class UpdateExecutor:
+    """
+    `workers` daemon threads with a bounded queue each, started lazily in every (forked) process.
+    Updates are partitioned by chat: one chat always lands on the same thread and is processed in order,
+    different chats run in parallel.
+    submit() waits up to `submit_timeout` seconds for room in the partition and returns False if there is none.
+    The refused update must be delivered again, not processed elsewhere: later updates of its chat are refused
+    too until it is accepted, so that none of them overtakes it.
+    An update whose chat lock times out is retried by its thread, the chat's later updates wait behind it.
+    """
+
+    def __init__(self, process_update: Callable[[Dict], None], workers: int, queue_size: int,
+                 submit_timeout: float = 0) -> None:
+        self.process_update = process_update
+        self.workers = workers
+        self.queue_size = queue_size
+        self.submit_timeout = submit_timeout
+        self.rejected = 0
+        self.lock_retries = 0
+        self._queues: List[queue.Queue] = []
+        # chat -> (first refused update_id, refused at); guarded by _lock
+        self._stalled: Dict[int, Tuple[int, float]] = {}
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_workers(self) -> List[queue.Queue]:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    partition_size = max(1, -(-self.queue_size // self.workers))
+                    self._queues = [queue.Queue(maxsize=partition_size) for _ in range(self.workers)]
+                    for i, updates in enumerate(self._queues):
+                        threading.Thread(target=self._run, args=(updates,), name=f'webhook-{i}', daemon=True).start()
+                    self._pid = pid
+        return self._queues
+
+    def submit(self, update_json: Dict, received_at: float) -> bool:
+        queues = self._ensure_workers()
+        update_id = update_json.get('update_id', 0)
+        chat_id = get_chat_id(update_json)
+        key = chat_id if chat_id is not None else update_id
+
+        with self._lock:
+            stalled = self._stalled.get(key)
+            if stalled is not None and time.monotonic() - stalled[1] > STALLED_CHAT_TTL:
+                del self._stalled[key]
+                stalled = None
+            if stalled is not None and update_id > stalled[0]:
+                # an earlier update of the chat is waiting to be delivered again
+                self.rejected += 1
+                return False
+
+        partition = queues[hash(key) % len(queues)]
+        try:
+            if self.submit_timeout > 0:
+                partition.put((update_json, received_at), timeout=self.submit_timeout)
+            else:
+                partition.put_nowait((update_json, received_at))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+                self._stalled.setdefault(key, (update_id, time.monotonic()))
+            return False
+
+        if stalled is not None and update_id == stalled[0]:
+            with self._lock:
+                if self._stalled.get(key) == stalled:
+                    del self._stalled[key]
+        return True
+
+    def _run(self, updates: queue.Queue) -> None:
+        while True:
+            update_json, received_at = updates.get()
+            close_old_connections()
+            try:
+                self._process(update_json)
+            except Exception:
+                logger.exception(f"Failed to process update {update_json.get('update_id')}")
+            finally:
+                observe_latency('inprocess', received_at)
+                close_old_connections()
+                updates.task_done()
+
+    def _process(self, update_json: Dict) -> None:
+        while True:
+            try:
+                self.process_update(update_json)
+                return
+            except ChatLockTimeout:
+                # the chat's previous update still runs in another process, its lock expires in the end
+                with self._lock:
+                    self.lock_retries += 1
+
+    def get_metrics(self) -> Dict:
+        depths = [q.qsize() for q in self._queues] if self._pid == os.getpid() else [0] * self.workers
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'queue_depth': sum(depths),
+            'max_partition_depth': max(depths, default=0),
+            'partition_depths': depths,
+            'rejected': self.rejected,
+            'stalled_chats': len(self._stalled),
+            'lock_retries': self.lock_retries,
+        }
@@ -0,0 +1,112 @@
+"""
+    Write-behind buffer of user activity.
+    Profile fields and `updated_at` of already existing users are collected per worker process
+    and written with one bulk UPDATE every USER_ACTIVITY_FLUSH_INTERVAL seconds.
+    New users are still created synchronously in User.get_user_and_created.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+
+from collections import defaultdict
+from datetime import datetime
+
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from dtb.settings import USER_ACTIVITY_FLUSH_INTERVAL, USER_ACTIVITY_BUFFER_MAXSIZE
+
+if TYPE_CHECKING:
+    from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """ user_id -> (profile fields, time of the interaction); the latest interaction of a user wins """
+
+    def __init__(self, flush_interval: float, maxsize: int) -> None:
+        self.flush_interval = flush_interval
+        self.maxsize = maxsize
+        self._pending: Dict[int, Tuple[Dict, datetime]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: int, profile: Dict, timestamp: Optional[datetime] = None) -> None:
+        timestamp = timezone.now() if timestamp is None else timestamp
+        with self._lock:
+            self._pending[user_id] = (profile, timestamp)
+            size = len(self._pending)
+
+        self._ensure_flusher()
+        if size >= self.maxsize:
+            self._wakeup.set()
+
+    def _ensure_flusher(self) -> None:
+        """ One flusher thread per process: a forked worker starts its own """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name='user-activity-flusher', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'User activity flush failed: {e}')
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """ Write all pending activity with one bulk UPDATE per set of profile fields """
+        from users.models import User
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return 0
+
+            by_fields: Dict[Tuple[str, ...], List[User]] = defaultdict(list)
+            for user_id, (profile, timestamp) in pending.items():
+                fields = tuple(sorted(name for name in profile if name != 'user_id'))
+                by_fields[fields].append(User(**dict(profile, user_id=user_id, updated_at=timestamp)))
+
+            try:
+                for fields, users in by_fields.items():
+                    User.objects.bulk_update(users, [*fields, 'updated_at'], batch_size=self.maxsize)
+            except Exception:
+                # keep what failed unless a newer interaction has been buffered meanwhile
+                with self._lock:
+                    for user_id, entry in pending.items():
+                        self._pending.setdefault(user_id, entry)
+                raise
+
+            return len(pending)
+
+
+activity_buffer = ActivityBuffer(
+    flush_interval=USER_ACTIVITY_FLUSH_INTERVAL,
+    maxsize=USER_ACTIVITY_BUFFER_MAXSIZE,
+)
+
+atexit.register(activity_buffer.flush)
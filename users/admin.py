@@ -1,15 +1,21 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.timezone import now
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 
 from dtb.settings import DEBUG
 
 from users.models import Location
-from users.models import User
+from users.models import User, BroadcastJob, BroadcastChunk
 from users.forms import BroadcastForm
+from users.cache import user_cache
 
-from users.tasks import broadcast_message
-from tgbot.handlers.broadcast_message.utils import send_one_message
+from users.tasks import start_broadcast_job
 
 
 @admin.register(User)
@@ -25,31 +31,84 @@ class UserAdmin(admin.ModelAdmin):
 
     actions = ['broadcast']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        user_cache.invalidate(obj.user_id)
+
     def broadcast(self, request, queryset):
         """ Select users via check mark in django-admin panel, then select "Broadcast" to send message"""
-        user_ids = queryset.values_list('user_id', flat=True).distinct().iterator()
-        if 'apply' in request.POST:
-            broadcast_message_text = request.POST["broadcast_text"]
-
-            if DEBUG:  # for test / debug purposes - run in same thread
-                for user_id in user_ids:
-                    send_one_message(
-                        user_id=user_id,
-                        text=broadcast_message_text,
-                    )
-                self.message_user(request, f"Just broadcasted to {len(queryset)} users")
-            else:
-                broadcast_message.delay(text=broadcast_message_text, user_ids=list(user_ids))
-                self.message_user(request, f"Broadcasting of {len(queryset)} messages has been started")
-
-            return HttpResponseRedirect(request.get_full_path())
-        else:
-            form = BroadcastForm(initial={'_selected_action': user_ids})
-            return render(
-                request, "admin/broadcast_message.html", {'form': form, 'title': u'Broadcast message'}
+        # "select all" keeps only the checked rows of the page in the form, the changelist rebuilds the queryset
+        form = BroadcastForm(request.POST if 'apply' in request.POST or 'count' in request.POST else None,
+                             initial={'_selected_action': request.POST.getlist(ACTION_CHECKBOX_NAME),
+                                      'select_across': request.POST.get('select_across')})
+        audience_count = None
+        selected_all: bool = request.POST.get('select_across') == '1' and not queryset.query.has_filters()
+        selected = None if selected_all else queryset.values('user_id')
+
+        if form.is_bound and form.is_valid():
+            audience = dict(
+                include_blocked=form.cleaned_data['include_blocked'],
+                only_verified=form.cleaned_data['only_verified'],
+                language_code=form.cleaned_data['language_code'] or None,
+                active_since=now() - timedelta(days=form.cleaned_data['active_days'])
+                if form.cleaned_data['active_days'] else None,
             )
+            # dry run: only count the recipients
+            audience_count = User.get_audience(selected=selected, **audience).count()
+
+            if 'apply' in request.POST and form.cleaned_data['broadcast_text']:
+                with transaction.atomic():
+                    job = BroadcastJob.objects.create(
+                        text=form.cleaned_data['broadcast_text'], only_selected=selected is not None, **audience,
+                    )
+                    if selected is not None:
+                        job.set_recipients(queryset)
+
+                if DEBUG:  # for test / debug purposes - run in same thread
+                    start_broadcast_job(job.pk)
+                    self.message_user(request, f"Just broadcasted to {audience_count} users")
+                else:
+                    start_broadcast_job.delay(job.pk)
+                    self.message_user(request, f"Broadcasting of {audience_count} messages has been started")
+
+                return HttpResponseRedirect(request.get_full_path())
+
+        return render(
+            request, "admin/broadcast_message.html",
+            {'form': form, 'title': u'Broadcast message', 'audience_count': audience_count},
+        )
 
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ['id', 'user_id', 'created_at']
+
+
+class BroadcastChunkInline(admin.TabularInline):
+    model = BroadcastChunk
+    fields = ['after_user_id', 'last_user_id', 'cursor', 'status', 'delivered', 'blocked', 'failed', 'updated_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(BroadcastJob)
+class BroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created_at', 'status', 'text', 'delivered', 'blocked', 'failed']
+    list_filter = ['status']
+    readonly_fields = ['status', 'is_planned']
+    inlines = [BroadcastChunkInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            delivered=Sum('chunks__delivered'), blocked=Sum('chunks__blocked'), failed=Sum('chunks__failed'),
+        )
+
+    def delivered(self, obj):
+        return obj.delivered or 0
+
+    def blocked(self, obj):
+        return obj.blocked or 0
+
+    def failed(self, obj):
+        return obj.failed or 0
@@ -0,0 +1,159 @@
+"""
+    Cache of User rows for the per-update lookups made by the handler decorators.
+    In-process LRU with TTL, optionally backed by the project Redis so that several
+    workers share entries and admin-side invalidation reaches all of them.
+    An entry expires a fixed time after its row was read from the DB, hits never extend it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from datetime import datetime
+
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+
+from dtb.settings import (REDIS_URL, USER_CACHE_MAXSIZE, USER_CACHE_TTL, USER_CACHE_LOCAL_TTL,
+                          USER_CACHE_USE_REDIS)
+
+if TYPE_CHECKING:
+    from users.models import User
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
+class UserSessionCache:
+    """ user_id -> (User field values, time of the last profile write) """
+
+    def __init__(self, maxsize: int, ttl: float, redis_client=None, local_ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # invalidate() of another process never reaches local entries: they only live long enough
+        # to absorb bursts of updates, the shared layer (if any) keeps entries for the full ttl
+        self.local_ttl = min(ttl, local_ttl) if local_ttl is not None else ttl
+        self.redis = redis_client
+        self._entries: OrderedDict[int, Tuple[float, Dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f'user_cache:{user_id}'
+
+    @staticmethod
+    def _to_values(user: User) -> Dict:
+        values = {}
+        for field in user._meta.concrete_fields:
+            value = getattr(user, field.attname)
+            if field.attname in DATETIME_FIELDS and value is not None:
+                value = value.isoformat()
+            elif field.attname in ('hair_length', 'hair_density'):
+                value = int(value)
+            values[field.attname] = value
+        return values
+
+    @staticmethod
+    def _to_user(values: Dict) -> User:
+        from users.models import User, HairLengthEnum, HairDensityEnum
+
+        enum_fields = {'hair_length': HairLengthEnum, 'hair_density': HairDensityEnum}
+        values = {
+            name: datetime.fromisoformat(value) if name in DATETIME_FIELDS and value is not None
+            else enum_fields[name].get(value) if name in enum_fields and value is not None
+            else value
+            for name, value in values.items()
+        }
+        return User.from_db('default', list(values), list(values.values()))
+
+    def get(self, user_id: int) -> Optional[Tuple[User, float]]:
+        """ Cached user and the time its profile was last written to the DB """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, values, touched_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(user_id)
+                    return self._to_user(values), touched_at
+                del self._entries[user_id]
+
+        if self.redis is not None:
+            try:
+                payload = self.redis.get(self._key(user_id))
+            except Exception as e:
+                logger.warning(f'User cache: redis is unavailable ({e})')
+                payload = None
+
+            if payload is not None:
+                values, touched_ago = json.loads(payload)
+                touched_at = now - touched_ago
+                self._store(user_id, values, touched_at)
+                return self._to_user(values), touched_at
+
+        return None
+
+    def _store(self, user_id: int, values: Dict, touched_at: float) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.local_ttl, values, touched_at)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, user: User, touched_at: Optional[float] = None) -> None:
+        """ Caches a user just read from (or written to) the DB, for ttl seconds from now """
+        touched_at = time.monotonic() if touched_at is None else touched_at
+        values = self._to_values(user)
+        self._store(user.user_id, values, touched_at)
+
+        if self.redis is not None:
+            try:
+                # monotonic clocks differ between processes, so keep the age of the write instead
+                payload = json.dumps([values, time.monotonic() - touched_at])
+                self.redis.set(self._key(user.user_id), payload, ex=int(self.ttl))
+            except Exception as e:
+                logger.warning(f'User cache: redis is unavailable ({e})')
+
+    def touch(self, user: User, touched_at: float) -> None:
+        """
+        Profile of a cached user changed by an update: only the local copy is refreshed and its expiry is kept,
+        so neither frequent updates nor a stale copy written back to redis outlive an invalidation
+        """
+        values = self._to_values(user)
+        with self._lock:
+            entry = self._entries.get(user.user_id)
+            if entry is not None:
+                self._entries[user.user_id] = (entry[0], values, touched_at)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._key(user_id))
+            except Exception as e:
+                logger.warning(f'User cache: redis is unavailable ({e})')
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _get_redis_client():
+    if not USER_CACHE_USE_REDIS:
+        return None
+
+    import redis
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=0.5)
+
+
+user_cache = UserSessionCache(
+    maxsize=USER_CACHE_MAXSIZE,
+    ttl=USER_CACHE_TTL,
+    redis_client=_get_redis_client(),
+    local_ttl=USER_CACHE_LOCAL_TTL,
+)
@@ -3,4 +3,9 @@ from django import forms
 
 class BroadcastForm(forms.Form):
     _selected_action = forms.CharField(widget=forms.MultipleHiddenInput)
-    broadcast_text = forms.CharField(widget=forms.Textarea)
+    select_across = forms.BooleanField(required=False, widget=forms.HiddenInput)
+    broadcast_text = forms.CharField(widget=forms.Textarea, required=False)
+    include_blocked = forms.BooleanField(required=False, help_text='Also send to users who blocked the bot')
+    only_verified = forms.BooleanField(required=False)
+    language_code = forms.CharField(max_length=8, required=False)
+    active_days = forms.IntegerField(min_value=1, required=False, help_text='Only users active in the last N days')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from dtb.settings import BROADCAST_WORKERS, BROADCAST_RATE_LIMIT
+from tgbot.handlers.broadcast_message.engine import BroadcastEngine
+from tgbot.handlers.broadcast_message.local_api import LocalBotApiServer
+from tgbot.client import get_bot_metrics
+
+BENCHMARK_TOKEN = '123456:benchmark-token'
+
+
+class Command(BaseCommand):
+    help = 'Broadcasts to fake chats through a local stand-in of the Bot API and shows messages per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=300, help='Number of recipients')
+        parser.add_argument('--workers', type=int, default=BROADCAST_WORKERS, help='Concurrent senders')
+        parser.add_argument('--rate', type=float, default=BROADCAST_RATE_LIMIT, help='Global rate limit, msg/sec')
+        parser.add_argument('--latency', type=float, default=0.1, help='Answer time of the stand-in API, sec')
+        parser.add_argument('--server-rate', type=float, default=30, help='Stand-in API answers 429 above this rate')
+        parser.add_argument('--blocked', type=int, default=0, help='Recipients who blocked the bot')
+
+    def handle(self, *args, **options):
+        user_ids = list(range(1, options['messages'] + 1))
+        server = LocalBotApiServer(
+            latency=options['latency'], rate_limit=options['server_rate'], blocked=user_ids[:options['blocked']],
+        ).start()
+
+        try:
+            engine = BroadcastEngine(
+                tg_token=BENCHMARK_TOKEN, workers=options['workers'], rate_limit=options['rate'],
+                base_url=server.base_url,
+            )
+            result = engine.broadcast(user_ids, 'benchmark', update_users=False)
+        finally:
+            server.stop()
+
+        self.stdout.write(
+            f'{result.total} messages in {result.elapsed:.2f}s: delivered {len(result.delivered)}, '
+            f'blocked {len(result.blocked)}, failed {len(result.failed)}, '
+            f'{result.retries} retries ({server.rejected} answered with 429)'
+        )
+        metrics = get_bot_metrics()
+        self.stdout.write(
+            f'{metrics["requests"]} HTTP requests over {metrics["connections"]} connections '
+            f'({metrics["reuse_ratio"]:.1%} reused)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{result.messages_per_second:.1f} msg/sec'))
@@ -0,0 +1,87 @@
+import time
+
+from typing import Callable, List, Tuple
+
+from django.core.management.base import BaseCommand
+from telegram import Bot, Update
+from telegram.ext import CallbackQueryHandler, Dispatcher
+
+from tgbot.handlers.utils.callback_data import SEPARATOR, callback_codec
+from tgbot.handlers.utils.callback_router import CallbackRouter
+
+BENCHMARK_TOKEN = '123456:benchmark-token'
+
+# CallbackQueryHandler patterns and a button of each, as registered before callback_data had tags
+LEGACY_ROUTES: Tuple[Tuple[str, str], ...] = (
+    ('STARTHAIRLENGTH#', 'STARTHAIRLENGTH#ONEWAY#'),
+    ('STARTHAIRDENSITY#', 'STARTHAIRDENSITY#ONEWAY#SHORT#'),
+    ('CONFIRMSELECTHAIR#', 'CONFIRMSELECTHAIR#ONEWAY#SHORT#THIN#'),
+    ('^SCRT_LVL', 'SCRT_LVL'),
+    ('^CNFM_DCLN_BRDCST', 'CNFM_DCLN_BRDCSTCONFIRM'),
+    ('STARTPROCEDUREBUTTON#', 'STARTPROCEDUREBUTTON#True#'),
+    ('PROCEDURE#', 'PROCEDURE#True#Complex_Color'),
+    ('DATE#', 'DATE#True#2024-05-06#Complex_Color'),
+    ('CHOICE#', 'CHOICE#True#2024-05-06#Complex Color#TMESLT#10:00#13:30'),
+    ('SCHEDULECONFIRM#', 'SCHEDULECONFIRM#True#2024-05-06#Complex Color#10:00'),
+    ('SCHEDULEDECLINE#', 'SCHEDULEDECLINE#True#'),
+    ('^SEND_PHOTO', 'SEND_PHOTO'),
+)
+
+
+def noop(update: Update, context) -> None:
+    pass
+
+
+def make_update(bot: Bot, update_id: int, data: str) -> Update:
+    return Update.de_json({'update_id': update_id, 'callback_query': {
+        'id': str(update_id), 'chat_instance': '1', 'data': data,
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'benchmark'},
+        'message': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}},
+    }}, bot)
+
+
+class Command(BaseCommand):
+    help = 'Compares per-update routing cost of sequential regex CallbackQueryHandlers and the CallbackRouter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=20000, help='Button presses per measurement')
+        parser.add_argument('--extra-menus', type=int, nargs='*', default=[0, 50, 200],
+                            help='Numbers of additional button types to measure with')
+
+    def measure(self, dispatcher: Dispatcher, updates: List[Update]) -> float:
+        """ Microseconds per update """
+        started_at = time.perf_counter()
+        for update in updates:
+            dispatcher.process_update(update)
+        return (time.perf_counter() - started_at) / len(updates) * 1e6
+
+    def build(self, bot: Bot, register: Callable[[Dispatcher], List[str]], count: int) -> Tuple[Dispatcher, List[Update]]:
+        dispatcher = Dispatcher(bot, update_queue=None, workers=0, use_context=True)
+        buttons = register(dispatcher)
+        return dispatcher, [make_update(bot, i, buttons[i % len(buttons)]) for i in range(count)]
+
+    def handle(self, *args, **options):
+        bot = Bot(BENCHMARK_TOKEN)
+        tags = list(callback_codec.schemas)
+
+        for extra in options['extra_menus']:
+            def register_legacy(dispatcher: Dispatcher) -> List[str]:
+                routes = list(LEGACY_ROUTES) + [(f'MENU{i}#', f'MENU{i}#data') for i in range(extra)]
+                for pattern, _ in routes:
+                    dispatcher.add_handler(CallbackQueryHandler(noop, pattern=pattern))
+                return [data for _, data in routes]
+
+            def register_router(dispatcher: Dispatcher) -> List[str]:
+                router = CallbackRouter()
+                routed = tags + [f'm{i}' for i in range(extra)]
+                for tag in routed:
+                    router.add_route(tag, noop)
+                dispatcher.add_handler(router)
+                return [f'{tag}{SEPARATOR}AQ' for tag in routed]
+
+            legacy = self.measure(*self.build(bot, register_legacy, options['updates']))
+            router = self.measure(*self.build(bot, register_router, options['updates']))
+            self.stdout.write(
+                f'{len(LEGACY_ROUTES) + extra:>4} button types: regex handlers {legacy:7.1f} us/update, '
+                f'router {router:7.1f} us/update ({legacy / router:.1f}x)'
+            )
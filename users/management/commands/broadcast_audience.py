@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Dry run of a broadcast: counts the users it would be sent to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-blocked', action='store_true', help='Also count users who blocked the bot')
+        parser.add_argument('--verified', action='store_true', help='Only verified users')
+        parser.add_argument('--language', help='Telegram language code, e.g. ru')
+        parser.add_argument('--active-days', type=int, help='Only users active in the last N days')
+
+    def handle(self, *args, **options):
+        audience = User.get_audience(
+            include_blocked=options['include_blocked'],
+            only_verified=options['verified'],
+            language_code=options['language'],
+            active_since=now() - timedelta(days=options['active_days']) if options['active_days'] else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'{audience.count()} of {User.objects.count()} users'))
@@ -0,0 +1,138 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# code run by a fresh interpreter for every entry point: the import plus the warmup a first request/task needs
+ENTRY_POINTS: Dict[str, str] = {
+    'manage': 'import django; django.setup()',
+    'wsgi': 'import dtb.wsgi; from django.urls import get_resolver; get_resolver().url_patterns',
+    'asgi': 'import dtb.asgi; from django.urls import get_resolver; get_resolver().url_patterns',
+    'celery': 'from dtb.celery import app; import django; django.setup(); app.loader.import_default_modules()',
+    'polling': 'import run_polling',
+}
+
+PROJECT_PACKAGES = ('dtb', 'tgbot', 'users', 'schedules', 'utils', 'run_polling')
+
+RESULT_MARKER = '@@profile_startup@@'
+
+# runs inside the profiled interpreter: counts DB queries and outgoing connections made while importing
+PROBE = '''
+import json, resource, socket, sys, time
+
+counts = {"db_queries": 0, "network_calls": 0}
+
+_connect = socket.socket.connect
+def connect(self, address):
+    if self.family in (socket.AF_INET, socket.AF_INET6):
+        counts["network_calls"] += 1
+    return _connect(self, address)
+socket.socket.connect = connect
+
+from django.db.backends import utils
+_execute, _executemany = utils.CursorWrapper.execute, utils.CursorWrapper.executemany
+def execute(self, *args, **kwargs):
+    counts["db_queries"] += 1
+    return _execute(self, *args, **kwargs)
+def executemany(self, *args, **kwargs):
+    counts["db_queries"] += 1
+    return _executemany(self, *args, **kwargs)
+utils.CursorWrapper.execute, utils.CursorWrapper.executemany = execute, executemany
+
+started_at = time.perf_counter()
+exec(compile(sys.argv[1], "<entry point>", "exec"))
+elapsed = time.perf_counter() - started_at
+
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except (OSError, StopIteration):
+    pass
+
+print("%s%s" % (sys.argv[2], json.dumps(dict(counts, import_seconds=elapsed, rss_mb=rss_kb / 1024))))
+'''
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """ `-X importtime` lines: 'import time: self [us] | cumulative | imported package' """
+    modules: Dict[str, Dict] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # a module reported twice was imported again after a failed/circular first attempt
+        module = modules.setdefault(name.strip(), {'module': name.strip(), 'self_ms': 0, 'cumulative_ms': 0})
+        module['self_ms'] += int(self_us) / 1000
+        module['cumulative_ms'] = max(module['cumulative_ms'], int(cumulative_us) / 1000)
+    return list(modules.values())
+
+
+class Command(BaseCommand):
+    help = 'Starts every entry point in a fresh interpreter and reports import time, DB/network calls and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entry_points', nargs='*', help=f'Entry points to profile: {", ".join(ENTRY_POINTS)}')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to report per entry point')
+        parser.add_argument('--json', action='store_true', help='Machine-readable output')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def profile(self, name: str, top: int) -> Dict:
+        started_at = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, ENTRY_POINTS[name], RESULT_MARKER],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.getenv('PYTHONPATH')]))),
+        )
+        report = {'entry_point': name, 'process_seconds': time.perf_counter() - started_at}
+
+        result = next((line[len(RESULT_MARKER):] for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)), None)
+        if process.returncode != 0 or result is None:
+            errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+            report['error'] = '\n'.join(errors[-5:])
+            return report
+
+        modules = parse_importtime(process.stderr)
+        project_modules = [m for m in modules if m['module'].split('.')[0] in PROJECT_PACKAGES]
+        report.update(json.loads(result))
+        report['modules_imported'] = len(modules)
+        report['project_self_ms'] = sum(m['self_ms'] for m in project_modules)
+        report['slowest_modules'] = sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top]
+        report['slowest_project_modules'] = sorted(project_modules, key=lambda m: m['cumulative_ms'], reverse=True)[:top]
+        return report
+
+    def handle(self, *args, **options):
+        names = options['entry_points'] or list(ENTRY_POINTS)
+        unknown = set(names) - set(ENTRY_POINTS)
+        if unknown:
+            raise CommandError(f'Unknown entry points: {", ".join(sorted(unknown))}')
+
+        reports = [self.profile(name, options['top']) for name in names]
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(reports, f, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for report in reports:
+            if 'error' in report:
+                self.stdout.write(self.style.ERROR(f"{report['entry_point']}: failed\n{report['error']}"))
+                continue
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{report['entry_point']}: {report['import_seconds']:.2f}s import "
+                f"({report['process_seconds']:.2f}s process), {report['rss_mb']:.0f} MB RSS, "
+                f"{report['modules_imported']} modules, {report['db_queries']} DB queries, "
+                f"{report['network_calls']} network connections"
+            ))
+            for module in report['slowest_project_modules']:
+                self.stdout.write(f"  {module['cumulative_ms']:>8.1f} ms  {module['module']}")
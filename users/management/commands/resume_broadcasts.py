@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.models import BroadcastJob, BroadcastStatusEnum
+from users.tasks import start_broadcast_job
+
+
+class Command(BaseCommand):
+    help = 'Restarts the stopped chunks of unfinished broadcast jobs (e.g. after a worker crash)'
+
+    def handle(self, *args, **options):
+        job_ids = BroadcastJob.objects.exclude(status=BroadcastStatusEnum.DONE).values_list('pk', flat=True)
+        for job_id in job_ids:
+            start_broadcast_job.delay(job_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Resumed {len(job_ids)} broadcast jobs'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from tgbot.client import get_bot, get_bot_username
+from tgbot.system_commands import set_up_commands
+
+
+class Command(BaseCommand):
+    help = "Registers the bot's command menu in Telegram for every supported language"
+
+    def handle(self, *args, **options):
+        set_up_commands(get_bot())
+        self.stdout.write(self.style.SUCCESS(f'Commands of @{get_bot_username()} are set'))
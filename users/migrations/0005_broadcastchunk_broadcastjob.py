@@ -0,0 +1,54 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_enumfield.db.fields
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20240425_1102'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('text', models.TextField()),
+                ('entities', models.JSONField(blank=True, null=True)),
+                ('reply_markup', models.JSONField(blank=True, null=True)),
+                ('parse_mode', models.CharField(blank=True, default='HTML', max_length=16, null=True)),
+                ('recipient_ids', models.JSONField(blank=True, null=True)),
+                ('status', django_enumfield.db.fields.EnumField(default=1, enum=users.models.BroadcastStatusEnum)),
+                ('is_planned', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('after_user_id', models.PositiveBigIntegerField()),
+                ('last_user_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('cursor', models.PositiveBigIntegerField()),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('blocked', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('status', django_enumfield.db.fields.EnumField(default=1, enum=users.models.BroadcastStatusEnum)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='users.broadcastjob')),
+            ],
+            options={
+                'ordering': ('job', 'after_user_id'),
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.9 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_broadcastchunk_broadcastjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='active_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='include_blocked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='language_code',
+            field=models.CharField(blank=True, max_length=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='only_verified',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_blocked_bot', False)), fields=['user_id'], name='user_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_blocked_bot', False), ('is_verified_user', True)), fields=['user_id'], name='user_verified_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_blocked_bot', False)), fields=['language_code', 'user_id'], name='user_language_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['updated_at'], name='user_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.9 on 2026-10-18 16:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_recipient_ids(apps, schema_editor):
+    BroadcastJob = apps.get_model('users', 'BroadcastJob')
+    BroadcastRecipient = apps.get_model('users', 'BroadcastRecipient')
+    for job in BroadcastJob.objects.filter(recipient_ids__isnull=False).iterator():
+        BroadcastRecipient.objects.bulk_create(
+            [BroadcastRecipient(job_id=job.pk, user_id=user_id) for user_id in job.recipient_ids], batch_size=500
+        )
+        BroadcastJob.objects.filter(pk=job.pk).update(only_selected=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_auto_20261018_1544'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='only_selected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='BroadcastRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='users.broadcastjob')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.user')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastrecipient',
+            constraint=models.UniqueConstraint(fields=('job', 'user'), name='broadcast_recipient_unique'),
+        ),
+        migrations.RunPython(move_recipient_ids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='broadcastjob',
+            name='recipient_ids',
+        ),
+    ]
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import time
+
+from datetime import datetime
+
 from typing import Union, Optional, Tuple
 
 from django.db import models
-from django.db.models import QuerySet, Manager
+from django.db.models import QuerySet, Manager, Q
+from django.utils.timezone import now
 from telegram import Update
 from telegram.ext import CallbackContext
 
+from dtb.settings import USER_TOUCH_INTERVAL
 from tgbot.handlers.utils.info import extract_user_data_from_update
+from users.activity import activity_buffer
+from users.cache import user_cache
 from utils.models import CreateUpdateTracker, nb, CreateTracker, GetOrNoneManager
 
 from django_enumfield import enum
@@ -50,6 +58,18 @@ class User(CreateUpdateTracker):
     objects = GetOrNoneManager()  # user = User.objects.get_or_none(user_id=<some_id>)
     admins = AdminUserManager()  # User.admins.all()
 
+    class Meta(CreateUpdateTracker.Meta):
+        indexes = [
+            # broadcast audiences: keyset pagination over users who haven't blocked the bot
+            models.Index(fields=['user_id'], name='user_audience_idx', condition=Q(is_blocked_bot=False)),
+            models.Index(fields=['user_id'], name='user_verified_audience_idx',
+                         condition=Q(is_blocked_bot=False, is_verified_user=True)),
+            models.Index(fields=['language_code', 'user_id'], name='user_language_audience_idx',
+                         condition=Q(is_blocked_bot=False)),
+            # last activity: audiences and the active_24 stat
+            models.Index(fields=['updated_at'], name='user_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f'@{self.username}' if self.username is not None else f'{self.user_id}'
 
@@ -57,7 +77,24 @@ class User(CreateUpdateTracker):
     def get_user_and_created(cls, update: Update, context: CallbackContext) -> Tuple[User, bool]:
         """ python-telegram-bot's Update, Context --> User instance """
         data = extract_user_data_from_update(update)
-        u, created = cls.objects.update_or_create(user_id=data["user_id"], defaults=data)
+
+        cached = user_cache.get(data["user_id"])
+        if cached is not None:
+            u, touched_at = cached
+            created = False
+        else:
+            # only new users are written synchronously, activity of existing ones goes to the buffer
+            u, created = cls.objects.get_or_create(user_id=data["user_id"], defaults=data)
+            touched_at = time.monotonic() if created else cls._get_touched_at(u)
+            user_cache.set(u, touched_at)
+
+        profile_changed = any(getattr(u, k) != v for k, v in data.items())
+        if profile_changed or time.monotonic() - touched_at >= USER_TOUCH_INTERVAL:
+            for k, v in data.items():
+                setattr(u, k, v)
+            u.updated_at = now()
+            activity_buffer.add(u.user_id, data, u.updated_at)
+            user_cache.touch(u, time.monotonic())
 
         if created:
             # Save deep_link to User model
@@ -66,6 +103,7 @@ class User(CreateUpdateTracker):
                 if str(payload).strip() != str(data["user_id"]).strip():  # you can't invite yourself
                     u.deep_link = payload
                     u.save()
+                    user_cache.set(u)
 
         return u, created
 
@@ -74,6 +112,48 @@ class User(CreateUpdateTracker):
         u, _ = cls.get_user_and_created(update, context)
         return u
 
+    @classmethod
+    def get_cached(cls, user_id: int) -> User:
+        """ User by telegram_id through user_cache, e.g. the admin's service users with their hair profile """
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached[0]
+
+        u = cls.objects.get(user_id=user_id)
+        user_cache.set(u, cls._get_touched_at(u))
+        return u
+
+    @staticmethod
+    def _get_touched_at(u: User) -> float:
+        """ updated_at of the row on the monotonic clock of user_cache """
+        return time.monotonic() - (now() - u.updated_at).total_seconds()
+
+    @classmethod
+    def get_audience(
+        cls,
+        selected: Optional[QuerySet] = None,
+        include_blocked: bool = False,
+        only_verified: bool = False,
+        language_code: Optional[str] = None,
+        active_since: Optional[datetime] = None,
+    ) -> QuerySet[User]:
+        """
+        Broadcast recipients; .count() of the result is the dry run.
+        selected: user ids (a .values() queryset, filtered as a subquery) to choose from, all users when None
+        """
+        users = cls.objects.all()
+        if selected is not None:
+            users = users.filter(user_id__in=selected)
+        if not include_blocked:
+            users = users.filter(is_blocked_bot=False)
+        if only_verified:
+            users = users.filter(is_verified_user=True)
+        if language_code:
+            users = users.filter(language_code=language_code)
+        if active_since is not None:
+            users = users.filter(updated_at__gte=active_since)
+        return users
+
     @classmethod
     def get_user_by_username_or_user_id(cls, username_or_user_id: Union[str, int]) -> Optional[User]:
         """ Search user in DB, return User or None if not found """
@@ -102,3 +182,119 @@ class Location(CreateTracker):
 
     def __str__(self):
         return f"user: {self.user}, created at {self.created_at.strftime('(%H:%M, %d %B %Y)')}"
+
+
+class BroadcastStatusEnum(enum.Enum):
+    PENDING = 1
+    RUNNING = 2
+    DONE = 3
+
+
+class BroadcastJob(CreateUpdateTracker):
+    """ Message sent to all users (or to the selected ones) chunk by chunk """
+    text = models.TextField()
+    entities = models.JSONField(**nb)
+    reply_markup = models.JSONField(**nb)
+    parse_mode = models.CharField(max_length=16, default='HTML', **nb)
+    # audience (see User.get_audience): users chosen in the admin panel (BroadcastRecipient rows,
+    # all users when not only_selected) and filters
+    only_selected = models.BooleanField(default=False)
+    include_blocked = models.BooleanField(default=False)
+    only_verified = models.BooleanField(default=False)
+    language_code = models.CharField(max_length=8, **nb)
+    active_since = models.DateTimeField(**nb)
+
+    status = enum.EnumField(BroadcastStatusEnum, default=BroadcastStatusEnum.PENDING)
+    is_planned = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'Broadcast #{self.pk} ({self.created_at:%d.%m.%Y %H:%M})'
+
+    def get_recipients(self) -> QuerySet[User]:
+        return User.get_audience(
+            selected=self.recipients.values('user_id') if self.only_selected else None,
+            include_blocked=self.include_blocked,
+            only_verified=self.only_verified,
+            language_code=self.language_code,
+            active_since=self.active_since,
+        )
+
+    def plan_chunks(self, chunk_size: int) -> None:
+        """
+        Split the recipients into ranges of `chunk_size` user ids (keyset pagination),
+        reading only the boundary id of every range
+        """
+        if self.is_planned:
+            return
+
+        recipients = self.get_recipients().order_by('user_id').values_list('user_id', flat=True)
+        chunks = []
+        after_user_id = 0
+        while True:
+            last_user_id = recipients.filter(user_id__gt=after_user_id)[chunk_size - 1:chunk_size].first()
+            chunks.append(BroadcastChunk(job=self, after_user_id=after_user_id, last_user_id=last_user_id, cursor=after_user_id))
+            if last_user_id is None:
+                break
+            after_user_id = last_user_id
+
+        BroadcastChunk.objects.bulk_create(chunks)
+        self.is_planned = True
+        self.status = BroadcastStatusEnum.RUNNING
+        self.save(update_fields=['is_planned', 'status', 'updated_at'])
+
+    def set_recipients(self, users: QuerySet[User], batch_size: int = 1000) -> None:
+        """ Stores the users chosen in the admin panel, `batch_size` ids in memory at a time """
+        user_ids = users.order_by('user_id').values_list('user_id', flat=True)
+        after_user_id = 0
+        while True:
+            batch = list(user_ids.filter(user_id__gt=after_user_id)[:batch_size])
+            if not batch:
+                break
+            BroadcastRecipient.objects.bulk_create([BroadcastRecipient(job=self, user_id=user_id) for user_id in batch])
+            after_user_id = batch[-1]
+
+    def get_counts(self) -> dict:
+        """ Delivered / blocked / failed messages over all chunks """
+        counts = self.chunks.aggregate(
+            delivered=models.Sum('delivered'), blocked=models.Sum('blocked'), failed=models.Sum('failed'),
+        )
+        return {name: value or 0 for name, value in counts.items()}
+
+
+class BroadcastRecipient(models.Model):
+    """ User chosen in the admin panel for a broadcast; get_recipients joins them by (job, user) """
+    job = models.ForeignKey(BroadcastJob, on_delete=models.CASCADE, related_name='recipients')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'user'], name='broadcast_recipient_unique'),
+        ]
+
+
+class BroadcastChunk(CreateUpdateTracker):
+    """ Recipients with after_user_id < user_id <= last_user_id (no upper bound when last_user_id is empty) """
+    job = models.ForeignKey(BroadcastJob, on_delete=models.CASCADE, related_name='chunks')
+    after_user_id = models.PositiveBigIntegerField()
+    last_user_id = models.PositiveBigIntegerField(**nb)
+    # last user_id the message was sent to: a restarted chunk continues after it
+    cursor = models.PositiveBigIntegerField()
+
+    delivered = models.PositiveIntegerField(default=0)
+    blocked = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    status = enum.EnumField(BroadcastStatusEnum, default=BroadcastStatusEnum.PENDING)
+
+    class Meta:
+        ordering = ('job', 'after_user_id')
+
+    def __str__(self):
+        return f'{self.job}: {self.after_user_id}..{self.last_user_id or ""}'
+
+    def get_pending_recipients(self, limit: int) -> list:
+        """ Next `limit` user ids after the cursor """
+        recipients = self.job.get_recipients().filter(user_id__gt=self.cursor)
+        if self.last_user_id is not None:
+            recipients = recipients.filter(user_id__lte=self.last_user_id)
+        return list(recipients.order_by('user_id').values_list('user_id', flat=True)[:limit])
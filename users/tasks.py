@@ -2,18 +2,28 @@
     Celery tasks. Some of them will be launched periodically from admin panel via django-celery-beat
 """
 
-import time
+from datetime import timedelta
+
 from typing import Union, List, Optional, Dict
 
 import telegram
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
 
 from dtb.celery import app
+from dtb.settings import (DEBUG, BROADCAST_RATE_LIMIT, BROADCAST_CHUNK_SIZE, BROADCAST_CONCURRENT_CHUNKS,
+                          BROADCAST_STALE_AFTER)
 from celery.utils.log import get_task_logger
-from tgbot.handlers.broadcast_message.utils import send_one_message, from_celery_entities_to_entities, \
-    from_celery_markup_to_markup
+from tgbot.handlers.broadcast_message.engine import BroadcastEngine, BroadcastResult, save_blocked_status
+from tgbot.handlers.broadcast_message.utils import from_celery_entities_to_entities, from_celery_markup_to_markup
+from users.models import BroadcastJob, BroadcastChunk, BroadcastStatusEnum
 
 logger = get_task_logger(__name__)
 
+# progress of a chunk is saved after every this many recipients
+CHUNK_BATCH_SIZE = 100
+
 
 @app.task(ignore_result=True)
 def broadcast_message(
@@ -21,7 +31,7 @@ def broadcast_message(
     text: str,
     entities: Optional[List[Dict]] = None,
     reply_markup: Optional[List[List[Dict]]] = None,
-    sleep_between: float = 0.4,
+    rate_limit: float = BROADCAST_RATE_LIMIT,
     parse_mode=telegram.ParseMode.HTML,
 ) -> None:
     """ It's used to broadcast message to big amount of users """
@@ -29,20 +39,95 @@ def broadcast_message(
 
     entities_ = from_celery_entities_to_entities(entities)
     reply_markup_ = from_celery_markup_to_markup(reply_markup)
-    for user_id in user_ids:
-        try:
-            send_one_message(
-                user_id=user_id,
-                text=text,
+    result = BroadcastEngine(rate_limit=rate_limit).broadcast(
+        user_ids=user_ids,
+        text=text,
+        parse_mode=parse_mode,
+        entities=entities_,
+        reply_markup=reply_markup_,
+    )
+
+    logger.info(f"Broadcast finished! {result}")
+
+
+@app.task(ignore_result=True)
+def start_broadcast_job(job_id: int) -> None:
+    """ Splits the job into chunks (once) and sends a task for every chunk that isn't done """
+    with transaction.atomic():
+        job = BroadcastJob.objects.select_for_update().get(pk=job_id)
+        job.plan_chunks(BROADCAST_CHUNK_SIZE)
+
+    chunk_ids = job.chunks.exclude(status=BroadcastStatusEnum.DONE).values_list('pk', flat=True)
+    logger.info(f"{job}: starting {len(chunk_ids)} chunks")
+    for chunk_id in chunk_ids:
+        if DEBUG:
+            send_broadcast_chunk(chunk_id)
+        else:
+            send_broadcast_chunk.delay(chunk_id)
+
+
+def claim_chunk(chunk_id: int) -> bool:
+    """ Only a pending chunk or a running one without progress for BROADCAST_STALE_AFTER seconds may be taken """
+    stale = Q(status=BroadcastStatusEnum.RUNNING, updated_at__lt=now() - timedelta(seconds=BROADCAST_STALE_AFTER))
+    return BroadcastChunk.objects.filter(
+        Q(status=BroadcastStatusEnum.PENDING) | stale, pk=chunk_id,
+    ).update(status=BroadcastStatusEnum.RUNNING, updated_at=now()) == 1
+
+
+@app.task(ignore_result=True, acks_late=True)
+def send_broadcast_chunk(chunk_id: int) -> None:
+    """ Sends the job's message to the chunk's recipients, continuing after the saved cursor """
+    if not claim_chunk(chunk_id):
+        return
+
+    chunk = BroadcastChunk.objects.select_related('job').get(pk=chunk_id)
+    job = chunk.job
+    # chunks of one job run in parallel, together they keep to the global rate
+    engine = BroadcastEngine(rate_limit=BROADCAST_RATE_LIMIT / BROADCAST_CONCURRENT_CHUNKS)
+    entities_ = from_celery_entities_to_entities(job.entities)
+    reply_markup_ = from_celery_markup_to_markup(job.reply_markup)
+
+    # outcomes of the whole chunk, is_blocked_bot is written once at the end
+    chunk_result = BroadcastResult()
+    try:
+        while True:
+            user_ids = chunk.get_pending_recipients(CHUNK_BATCH_SIZE)
+            if not user_ids:
+                break
+
+            result = engine.broadcast(
+                user_ids=user_ids,
+                text=job.text,
+                parse_mode=job.parse_mode,
                 entities=entities_,
-                parse_mode=parse_mode,
                 reply_markup=reply_markup_,
+                update_users=False,
             )
-            logger.info(f"Broadcast message was sent to {user_id}")
-        except Exception as e:
-            logger.error(f"Failed to send message to {user_id}, reason: {e}")
-        time.sleep(max(sleep_between, 0.1))
+            chunk.cursor = user_ids[-1]
+            BroadcastChunk.objects.filter(pk=chunk.pk).update(
+                cursor=chunk.cursor,
+                delivered=F('delivered') + len(result.delivered),
+                blocked=F('blocked') + len(result.blocked),
+                failed=F('failed') + len(result.failed),
+                updated_at=now(),
+            )
+            chunk_result.merge(result)
+    except Exception:
+        # a retry or resume_broadcast_jobs may take the chunk again at once, it continues after the saved cursor
+        BroadcastChunk.objects.filter(pk=chunk.pk).update(status=BroadcastStatusEnum.PENDING, updated_at=now())
+        raise
+    finally:
+        save_blocked_status(chunk_result)
 
-    logger.info("Broadcast finished!")
+    BroadcastChunk.objects.filter(pk=chunk.pk).update(status=BroadcastStatusEnum.DONE, updated_at=now())
+    BroadcastJob.objects.filter(pk=job.pk).exclude(
+        chunks__status__in=[BroadcastStatusEnum.PENDING, BroadcastStatusEnum.RUNNING],
+    ).update(status=BroadcastStatusEnum.DONE, updated_at=now())
+    logger.info(f"{chunk} finished")
 
 
+@app.task(ignore_result=True)
+def resume_broadcast_jobs() -> None:
+    """ Restarts chunks of unfinished jobs that have stopped (e.g. after a worker crash) """
+    for job_id in BroadcastJob.objects.exclude(status=BroadcastStatusEnum.DONE).values_list('pk', flat=True):
+        start_broadcast_job(job_id)